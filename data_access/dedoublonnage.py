@@ -0,0 +1,244 @@
+"""
+Détection des quasi-doublons de variétés
+
+Le catalogue scrapé contient des variétés dont les noms ne diffèrent que par
+les accents, la ponctuation ou un suffixe ("Brandywine Glick's Strain" /
+"Brandywine Glicks"). Elles ont des id_source différents mais correspondent
+à la même variété.
+
+Ce module :
+- calcule une clé normalisée pour chaque nom (sans accents, ponctuation ni suffixes)
+- découpe la clé en n-grammes de caractères et calcule une signature MinHash
+- regroupe les signatures par bandes (LSH) : seules les variétés qui partagent
+  une bande (ou la même clé normalisée) sont comparées, ce qui évite de comparer
+  toutes les paires (temps quasi linéaire)
+- vérifie chaque paire candidate (similarité de Jaccard exacte)
+- forme des groupes (union-find) et les enregistre dans la table 'doublon_variete'
+
+Utilisation seule (sur une base déjà chargée) :
+    python dedoublonnage.py
+"""
+
+# ----------------------------------------------------------
+# Import des librairies
+# ----------------------------------------------------------
+
+import hashlib
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+
+# ----------------------------------------------------------
+# Paramètres
+# ----------------------------------------------------------
+
+#Taille des n-grammes de caractères
+TAILLE_NGRAMME = 3
+
+#MinHash : nombre de fonctions de hachage, découpées en bandes pour le LSH
+#(16 bandes de 4 lignes : les paires de similarité > ~0.5 ont de fortes chances d'être candidates)
+NB_PERMUTATIONS = 64
+NB_BANDES = 16
+
+#Similarité de Jaccard minimale pour considérer deux noms comme doublons
+SEUIL_SIMILARITE = 0.85
+
+#Mots sans valeur distinctive retirés des noms
+MOTS_IGNORES = {"strain", "souche", "type", "selection", "sel", "var", "variete", "variety", "bio"}
+
+#Mots de couleur : deux noms qui ne portent pas les mêmes couleurs sont des variétés différentes
+#("Cherokee Purple" / "Cherokee Green")
+MOTS_COULEUR = {
+    "red", "rouge", "rosso", "pink", "rose", "rosa", "yellow", "jaune", "gold", "golden",
+    "orange", "green", "verte", "vert", "black", "noire", "noir", "purple", "white",
+    "blanche", "blanc", "blue", "bleue", "bleu", "brown", "striped", "bicolor", "bicolore",
+}
+
+#Ligatures non décomposées par unicodedata
+LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae", "ß": "ss"})
+
+#Générateur fixe : les signatures sont identiques d'un import à l'autre
+_PREMIER = np.uint64(2_147_483_647)
+_ALEA = np.random.default_rng(20260101)
+_COEF_A = _ALEA.integers(1, int(_PREMIER), NB_PERMUTATIONS, dtype=np.uint64)
+_COEF_B = _ALEA.integers(0, int(_PREMIER), NB_PERMUTATIONS, dtype=np.uint64)
+
+
+# ----------------------------------------------------------
+# Normalisation et signatures
+# ----------------------------------------------------------
+
+#Clé normalisée d'un nom de variété
+def normaliser_nom(nom):
+    """
+    Minuscules, sans accents, sans apostrophes ni ponctuation,
+    sans les mots listés dans MOTS_IGNORES.
+    Si la normalisation ne laisse rien (nom sans lettres latines, nom fait
+    uniquement de mots ignorés), on garde le nom brut en minuscules : une clé
+    vide ne doit jamais rapprocher deux variétés.
+
+    >>> normaliser_nom("Brandywine Glick's Strain")
+    'brandywine glicks'
+    >>> normaliser_nom("Черный принц"), normaliser_nom("Strain")
+    ('черный принц', 'strain')
+    """
+    texte = unicodedata.normalize("NFKD", (nom or "").translate(LIGATURES))
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    texte = re.sub(r"['’`]", "", texte)
+    mots = [m for m in re.split(r"[^a-z0-9]+", texte) if m and m not in MOTS_IGNORES]
+    return " ".join(mots) or " ".join((nom or "").lower().split())
+
+
+#Ensemble des n-grammes de caractères d'une clé
+def ngrammes(cle, taille=TAILLE_NGRAMME):
+    texte = f" {cle} "
+    if len(texte) <= taille:
+        return {texte}
+    return {texte[i:i + taille] for i in range(len(texte) - taille + 1)}
+
+
+#Signature MinHash d'un ensemble de n-grammes
+def signature_minhash(elements):
+    hachages = np.array(
+        [int.from_bytes(hashlib.blake2b(e.encode("utf-8"), digest_size=8).digest(), "little") for e in elements],
+        dtype=np.uint64,
+    ) % _PREMIER
+    valeurs = (_COEF_A[:, None] * hachages[None, :] + _COEF_B[:, None]) % _PREMIER
+    return valeurs.min(axis=1)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+#Deux noms compatibles : mêmes couleurs et mêmes nombres
+def noms_compatibles(cle_a, cle_b):
+    mots_a, mots_b = set(cle_a.split()), set(cle_b.split())
+    if mots_a & MOTS_COULEUR != mots_b & MOTS_COULEUR:
+        return False
+    return {m for m in mots_a if m.isdigit()} == {m for m in mots_b if m.isdigit()}
+
+
+# ----------------------------------------------------------
+# Détection
+# ----------------------------------------------------------
+
+#Paires candidates : même clé normalisée ou même bande MinHash (jamais sur une clé vide)
+def paires_candidates(cles, signatures):
+    seaux = defaultdict(list)
+    lignes_par_bande = NB_PERMUTATIONS // NB_BANDES
+    for i, (cle, signature) in enumerate(zip(cles, signatures)):
+        if not cle:
+            continue
+        seaux[("cle", cle)].append(i)
+        for bande in range(NB_BANDES):
+            morceau = signature[bande * lignes_par_bande:(bande + 1) * lignes_par_bande]
+            seaux[(bande, morceau.tobytes())].append(i)
+
+    paires = set()
+    for membres in seaux.values():
+        if len(membres) > 1:
+            paires.update(combinations(membres, 2))
+    return paires
+
+
+def detecter_doublons(varietes, seuil=SEUIL_SIMILARITE):
+    """
+    Regroupe les quasi-doublons d'une liste de variétés (dictionnaires avec
+    'id_source' et 'nom'). Retourne une liste de lignes pour 'doublon_variete' :
+    (id_source, id_cluster, cle_normalisee, similarite), uniquement pour
+    les groupes d'au moins deux variétés. id_cluster est le plus petit id_source
+    du groupe (variété de référence). Une variété sans nom n'est jamais groupée.
+
+    >>> noms = ["Черный принц", "Бычье сердце", "桃太郎", "Strain", ""]
+    >>> detecter_doublons([{"id_source": i, "nom": n} for i, n in enumerate(noms)])
+    []
+    """
+    cles = [normaliser_nom(v["nom"]) for v in varietes]
+    ensembles = [ngrammes(cle) for cle in cles]
+    signatures = [signature_minhash(e) for e in ensembles]
+
+    #Union-find sur les indices
+    parents = list(range(len(varietes)))
+
+    def racine(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    for i, j in paires_candidates(cles, signatures):
+        if not cles[i] or not cles[j]:
+            continue
+        if cles[i] == cles[j] or (
+            noms_compatibles(cles[i], cles[j]) and jaccard(ensembles[i], ensembles[j]) >= seuil
+        ):
+            parents[racine(i)] = racine(j)
+
+    groupes = defaultdict(list)
+    for i in range(len(varietes)):
+        groupes[racine(i)].append(i)
+
+    lignes = []
+    for membres in groupes.values():
+        if len(membres) < 2:
+            continue
+        reference = min(membres, key=lambda i: varietes[i]["id_source"])
+        for i in membres:
+            lignes.append((
+                varietes[i]["id_source"],
+                varietes[reference]["id_source"],
+                cles[i],
+                round(jaccard(ensembles[i], ensembles[reference]), 4),
+            ))
+    return lignes
+
+
+def enregistrer_doublons(connexion, lignes):
+    """Remplace le contenu de la table 'doublon_variete'."""
+    connexion.execute("DELETE FROM doublon_variete;")
+    connexion.executemany(
+        """
+        INSERT INTO doublon_variete (id_source, id_cluster, cle_normalisee, similarite)
+        VALUES (?, ?, ?, ?);
+        """,
+        lignes,
+    )
+
+
+def dedoublonner_base(connexion, seuil=SEUIL_SIMILARITE):
+    """Détecte les doublons des variétés en base et met à jour 'doublon_variete'."""
+    varietes = [
+        {"id_source": id_source, "nom": nom}
+        for id_source, nom in connexion.execute("SELECT id_source, nom FROM variete")
+    ]
+    lignes = detecter_doublons(varietes, seuil)
+    enregistrer_doublons(connexion, lignes)
+    return lignes
+
+
+# ----------------------------------------------------------
+# Script principal
+# ----------------------------------------------------------
+
+if __name__ == "__main__":
+    BASE_DIR = Path(__file__).resolve().parent
+    DB_PATH = BASE_DIR / "../data/tomatocycle.db"
+    SCHEMA_PATH = BASE_DIR / "schema.sql"
+
+    connexion = sqlite3.connect(DB_PATH)
+    connexion.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    lignes = dedoublonner_base(connexion)
+    connexion.commit()
+
+    nb_groupes = len({ligne[1] for ligne in lignes})
+    print(f"{nb_groupes} groupes de doublons ({len(lignes)} variétés concernées)")
+
+    connexion.close()
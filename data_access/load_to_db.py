@@ -5,6 +5,7 @@ Ce script a pour rôle de :
 - créer les tables de la base (via schemas.sql)
 - lire le fichier JSON des variétés
 - insérer / mettre à jour les données en base SQLite
+- détecter les quasi-doublons de variétés (via dedoublonnage.py)
 """
 
 # ----------------------------------------------------------
@@ -16,6 +17,8 @@ import sqlite3
 from pathlib import Path   
 import random
 
+from dedoublonnage import dedoublonner_base
+
 
 # ----------------------------------------------------------
 # Définition des chemins du projet
@@ -42,7 +45,11 @@ if __name__ == "__main__":
 
     #Connexion à la base de données
     #Si le fichier n'existe pas, SQLite le crée automatiquement.
-    connexion = sqlite3.connect(DB_PATH)
+    connexion = sqlite3.connect(DB_PATH, timeout=30.0)
+
+    #Mode WAL : l'application peut continuer à lire pendant l'import
+    #(le même mode est utilisé par services/ecriture_service.py)
+    connexion.execute("PRAGMA journal_mode=WAL")
 
     cursor = connexion.cursor()
 
@@ -114,6 +121,11 @@ if __name__ == "__main__":
 
     print("nombre de variétés en base :", nb)
 
+    #Détection des quasi-doublons (noms proches) -> table doublon_variete
+    doublons = dedoublonner_base(connexion)
+    connexion.commit()
+    print(f"doublons détectés : {len({d[1] for d in doublons})} groupes, {len(doublons)} variétés")
+
     #Fermeture de la connexion
     connexion.close()
     print("connexion fermée — import terminé")
\ No newline at end of file
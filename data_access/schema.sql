@@ -17,3 +17,21 @@ CREATE TABLE IF NOT EXISTS variete (
     date_semence TEXT,
     image_url TEXT
 );
+
+
+-- ======================================================
+-- Table : doublon_variete
+-- Groupes de quasi-doublons détectés à l'import
+-- (noms qui ne diffèrent que par les accents, la ponctuation ou un suffixe)
+-- Une ligne par variété appartenant à un groupe d'au moins deux variétés.
+-- id_cluster = id_source de la variété de référence du groupe
+-- ======================================================
+
+CREATE TABLE IF NOT EXISTS doublon_variete (
+    id_source INTEGER PRIMARY KEY,
+    id_cluster INTEGER NOT NULL,
+    cle_normalisee TEXT,
+    similarite REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_doublon_variete_cluster ON doublon_variete (id_cluster);
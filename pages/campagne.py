@@ -9,69 +9,27 @@ La sélection repose sur deux principes :
 - Une recherche de diversité : lorsque plusieurs variétés ont la même priorité
    (même année de semence), un arbre de décision est utilisé pour équilibrer
    les caractéristiques (couleur, forme, taille, précocité).
+
+La logique de sélection se trouve dans services/rotation_service.py.
 """
 
 #Importation des bibliothèques
-from collections import defaultdict, Counter
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
 
+from services import cache_selection
 from services import db as db
+from services import export_service as export
 from services import pdf_service as pdfserv
 from services import rotation_service as rotation
+from services import similarite_service as similarite
 
 #-----------------------------------------
 # FONCTIONS
 #-----------------------------------------
 
-#-----------------------------------------
-# ARBRE DES CARACTERISTIQUES
-#-----------------------------------------
-
-# Construction d'un arbre de catégories
-def construire_arbre(varietes):
-    """
-    arbre à 4 niveaux à partir des variétés.
-    couleur
-        └── forme
-              └── taille
-                    └── précocité
-                          └── [liste de variétés]
-    """
-
-    #On crée les niveaux
-    #La fonction lambda avec defautdict permet de créer un sous dictionnaire automatiquement si il n'existe pas
-    arbre = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(
-                lambda: defaultdict(list)
-            )
-        )
-    )
-
-    # On parcourt toutes les variétés
-    for v in varietes:
-        couleur = v["couleur"]
-        forme = v["forme"]
-        taille = v["taille"]
-        precocite = v["precocite"]
-
-        # On place la variété dans la bonne "branche" de l'arbre
-        arbre[couleur][forme][taille][precocite].append(v)
-
-    return arbre
-
-#Fonction qui parcourt les feuilles de l'arbre
-def parcourir_feuilles(arbre):
-    for couleur, niveau_forme in arbre.items():
-        for forme, niveau_taille in niveau_forme.items():
-            for taille, niveau_precocite in niveau_taille.items():
-                for precocite, liste_varietes in niveau_precocite.items():
-                    yield couleur, forme, taille, precocite, liste_varietes
-
-
 #Fonction pour afficher l'arbre
 def afficher_arbre(arbre):
     for couleur, niveau_forme in arbre.items():
@@ -90,144 +48,47 @@ def afficher_arbre(arbre):
                     )
 
 
-
-# ----------------------------------------------------------
-# COMPTEURS DE DIVERSITE
-# ----------------------------------------------------------
-
-#On compte la diversité des caractéristiques
-def initialiser_compteurs():
-    return {
-        "couleur": Counter(),
-        "forme": Counter(),
-        "taille": Counter(),
-        "precocite": Counter(),
-    }
-
-#Mise à jour des compteurs
-def mettre_a_jour_compteurs(compteurs, variete):
-    compteurs["couleur"][variete["couleur"]] += 1
-    compteurs["forme"][variete["forme"]] += 1
-    compteurs["taille"][variete["taille"]] += 1
-    compteurs["precocite"][variete["precocite"]] += 1
-
-#Calcul d'un score de présence
-def score_feuille(compteurs, couleur, forme, taille, precocite):
-    """
-    Score d'une feuille = "à quel point ces caractéristiques sont déjà présentes".
-    Plus le score est petit, plus la feuille est intéressante pour équilibrer.
-    """
-    return (
-        compteurs["couleur"][couleur]
-        + compteurs["forme"][forme]
-        + compteurs["taille"][taille]
-        + compteurs["precocite"][precocite]
-    )
-
-
-# ----------------------------------------------------------
-# SELECTION
-# ----------------------------------------------------------
-
-#Sélection des variétés
-def selectionner_dans_annee(varietes_annee, nb_a_prendre, compteurs):
-    selection = []
-    arbre = construire_arbre(varietes_annee)
-
-    while len(selection) < nb_a_prendre:
-        meilleure_feuille = None
-        meilleur_score = None
-
-        #On cherche la feuille non vide avec le plus petit score
-        for couleur, forme, taille, precocite, liste_varietes in parcourir_feuilles(arbre):
-            if not liste_varietes:
-                continue
-
-            s = score_feuille(compteurs, couleur, forme, taille, precocite)
-            if meilleur_score is None or s < meilleur_score:
-                meilleur_score = s
-                meilleure_feuille = liste_varietes
-
-        #Sécurité (ne devrait pas arriver)
-        if meilleure_feuille is None:
-            break
-
-        #On prend une variété dans la meilleure feuille
-        variete = meilleure_feuille.pop()
-        selection.append(variete)
-        mettre_a_jour_compteurs(compteurs, variete)
-
-    return selection
-
-
-# ----------------------------------------------------------
-# SELECTION COMPLETE CAMPAGNE 2026
-# ----------------------------------------------------------
-
-def selectionner_campagne(df_variete, objectif=40, annee_campagne=2026, duree_vie=6):
-    """
-    Remplit une sélection de variétés pour l'année de campagne.
-    """
-    df = df_variete.copy()
-
-    # date_semence est du TEXT -> on convertit en int
-    df["annee_semence"] = df["date_semence"].astype(int)
-    df["age_semence"] = annee_campagne - df["annee_semence"]
-
-    # On trie par année (plus ancien d'abord)
-    df = df.sort_values(["annee_semence", "nom"], ascending=[True, True])
-
-    selection = []
-    compteurs = initialiser_compteurs()
-
-    # Années présentes dans la base, triées de la plus ancienne à la plus récente
-    annees = sorted(df["annee_semence"].unique())
-
-    for annee in annees:
-        if len(selection) >= objectif:
-            break
-
-        df_annee = df[df["annee_semence"] == annee]
-        varietes_annee = df_annee.to_dict(orient="records")
-
-        places_restantes = objectif - len(selection)
-
-        # Si on peut tout prendre, on prend tout (priorité temporelle)
-        if len(varietes_annee) <= places_restantes:
-            for variete in varietes_annee:
-                selection.append(variete)
-                mettre_a_jour_compteurs(compteurs, variete)
-        else:
-            # Sinon, on choisit une partie avec l'arbre (diversité globale)
-            selection_partielle = selectionner_dans_annee(varietes_annee, places_restantes, compteurs)
-            selection.extend(selection_partielle)
-
-    # Info "urgente" : semences dont l'âge dépasse la durée de vie
-    nb_trop_vieux = int((df["age_semence"] > duree_vie).sum())
-    return selection, nb_trop_vieux
+#Variétés candidates (rechargées seulement si le contenu de la base change)
+@st.cache_data
+def charger_candidates(version):
+    return db.charger_varietes()
 
 
 #-----------------------------------------
 # INTERFACE
 #-----------------------------------------
 
-st.title("Campagne 2026")
-
-#Charger les variétés depuis la base
-df_variete = db.charger_donnees()
-
 #Paramètres
-objectif = 40
-annee_campagne = 2026 
+objectif = st.sidebar.number_input("Objectif (nombre de variétés)", min_value=1, value=rotation.OBJECTIF_DEFAUT)
+annee_campagne = st.sidebar.number_input("Année de campagne", min_value=2000, value=rotation.ANNEE_CAMPAGNE_DEFAUT)
+duree_vie = st.sidebar.number_input("Durée de vie des semences (ans)", min_value=1, value=rotation.DUREE_VIE_DEFAUT)
 
-#On lance la sélection
-selection, nb_trop_vieux = selectionner_campagne(
-    df_variete,
+st.title(f"Campagne {annee_campagne}")
+
+#On lance la sélection (servie par le cache si la base et les paramètres n'ont pas changé,
+#par exemple lors du rerun déclenché par le bouton d'export)
+selection, nb_trop_vieux = cache_selection.selectionner(
     objectif=objectif,
     annee_campagne=annee_campagne,
-    duree_vie=6
+    duree_vie=duree_vie
 )
 
+#Variétés impossibles à semer : remplacées automatiquement par la variété la plus similaire
+indisponibles = st.sidebar.multiselect(
+    "Variétés impossibles à semer",
+    options=[v["id"] for v in selection],
+    format_func={v["id"]: v["nom"] for v in selection}.get,
+)
+if indisponibles:
+    noms_selection = {v["id"]: v["nom"] for v in selection}
+    selection, remplacements = similarite.substituer_indisponibles(selection, indisponibles)
+    noms_selection.update({v["id"]: v["nom"] for v in selection})
+    for id_remplace, id_substitut in remplacements:
+        if id_substitut is None:
+            st.warning(f"Aucun substitut trouvé pour {noms_selection[id_remplace]}")
+        else:
+            st.info(f"{noms_selection[id_remplace]} remplacée par {noms_selection[id_substitut]}")
+
 #Affichage des variétés sélectionnées
 st.dataframe([
     {
@@ -246,23 +107,58 @@ if st.button("📄 Exporter la sélection en PDF"):
     pdf_path = pdfserv.exporter_selection_pdf(selection, annee_campagne)
     st.success(f"PDF généré : {pdf_path}")
 
+#Téléchargement de la sélection
+version_selection = f"{db.version_contenu()[:12]}_{objectif}_{annee_campagne}_{duree_vie}"
+if indisponibles:
+    version_selection += "_sans_" + "-".join(str(i) for i in sorted(indisponibles))
+format_export = st.radio("Format", list(export.FORMATS_EXPORT), horizontal=True, key="format_selection")
+if export.chemin_fichier("selection", version_selection, format_export).exists() or st.button(
+    "Préparer le fichier"
+):
+    chemin = export.preparer_fichier(
+        "selection",
+        version_selection,
+        format_export,
+        lambda: export.source_selection(selection),
+        types=export.types_variete(),
+    )
+    with open(chemin, "rb") as fichier:
+        st.download_button(
+            f"⬇️ {format_export.upper()}",
+            data=fichier,
+            file_name=f"campagne_{annee_campagne}.{format_export}",
+            mime=export.FORMATS_EXPORT[format_export],
+        )
+
 
 #Affichage de la répartition des couleurs
 st.subheader("Répartition des couleurs (campagne)")
 
-df_selection = pd.DataFrame(selection)
-df_couleurs = (
-    df_selection["couleur"]
-    .value_counts()
-    .reset_index()
-)
-df_couleurs.columns = ["couleur", "nombre"]
-fig = px.pie(df_couleurs, names="couleur", values="nombre", title="Répartition des couleurs")
-st.plotly_chart(fig, use_container_width=True)
+#La sélection peut être vide (objectif atteint par aucune variété, ou aucun substitut trouvé)
+if not selection:
+    st.info("Aucune variété dans la sélection")
+else:
+    df_selection = pd.DataFrame(selection)
+    df_couleurs = (
+        df_selection["couleur"]
+        .value_counts()
+        .reset_index()
+    )
+    df_couleurs.columns = ["couleur", "nombre"]
+    fig = px.pie(df_couleurs, names="couleur", values="nombre", title="Répartition des couleurs")
+    st.plotly_chart(fig, use_container_width=True)
 
 
 #Affichage arbre
 with st.expander("Afficher l'arbre"):
-    varietes_candidates = df_variete.to_dict(orient="records")
-    arbre = construire_arbre(varietes_candidates)
-    afficher_arbre(arbre)
\ No newline at end of file
+    varietes_candidates = charger_candidates(db.version_contenu())
+    arbre = rotation.construire_arbre(varietes_candidates)
+    afficher_arbre(arbre)
+
+
+#Métriques du cache des sélections
+metriques = cache_selection.metriques()
+st.caption(
+    f"Cache des sélections : {metriques['hits_memoire'] + metriques['hits_disque']} hits, "
+    f"{metriques['misses']} misses"
+)
@@ -4,24 +4,27 @@ Cette page affiche le catalogue complet des variétés de tomates.
 """
 
 #Importation des bibliothèques
-from pathlib import Path
-import streamlit as st
 import sqlite3
+from concurrent.futures import TimeoutError as DelaiDepasse
+
+import streamlit as st
 import pandas as pd
 
+from services import db
+from services import ecriture_service as ecriture
+from services import export_service as export
+from services import similarite_service as similarite
 from services import stats_service as serv
 
 st.title("Catalogue 🍅")
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1] 
-DB_PATH = PROJECT_ROOT / "data" / "tomatocycle.db"
-
+#Lecture via le pool partagé (connexions en lecture seule)
 @st.cache_data
-def load_catalogue():
-    with sqlite3.connect(str(DB_PATH)) as conn:
-        return pd.read_sql_query("SELECT * FROM variete LIMIT 50", conn)
+def load_catalogue(version):
+    with db.obtenir_pool().connexion() as conn:
+        return pd.DataFrame(db.lire_catalogue(conn, page=1, taille_page=50))
 
-df = load_catalogue()
+df = load_catalogue(db.version_base())
 st.dataframe(
     df,
     use_container_width=True,
@@ -32,3 +35,69 @@ st.dataframe(
         ),
     },
 )
+
+
+#Variétés similaires (substituts d'une variété impossible à semer)
+st.subheader("Variétés similaires")
+
+@st.cache_data
+def charger_noms(version):
+    return db.obtenir_pool().requete("SELECT id, nom FROM variete ORDER BY nom")
+
+noms = charger_noms(db.version_contenu())
+choix = st.selectbox(
+    "Variété de référence",
+    options=[v["id"] for v in noms],
+    format_func={v["id"]: v["nom"] for v in noms}.get,
+)
+nb_similaires = st.slider("Nombre de variétés proposées", min_value=1, max_value=similarite.NB_VOISINS, value=10)
+if choix is not None:
+    similaires = similarite.varietes_similaires(choix, nb_similaires)
+    st.dataframe(
+        pd.DataFrame(similaires)[
+            ["score", "nom", "couleur", "forme", "taille", "precocite", "notes_gustatives", "date_semence"]
+        ] if similaires else pd.DataFrame(),
+        use_container_width=True,
+    )
+
+
+#Mise à jour d'une date de semence (écriture via le coordinateur : pas de "database is locked")
+st.subheader("Mettre à jour une date de semence")
+with st.form("date_semence"):
+    id_variete = st.selectbox(
+        "Variété",
+        options=[v["id"] for v in noms],
+        format_func={v["id"]: v["nom"] for v in noms}.get,
+    )
+    annee = st.number_input("Année de la semence", min_value=1990, max_value=2100, value=2026)
+    if st.form_submit_button("Enregistrer"):
+        try:
+            ecriture.mettre_a_jour_date_semence(id_variete, annee, timeout=10).result(timeout=30)
+        except ecriture.FilePleine:
+            st.error("Trop de modifications en attente : réessayer dans quelques instants")
+        except ecriture.CoordinateurArrete as e:
+            st.error(f"Les écritures sont arrêtées : {e}")
+        except DelaiDepasse:
+            st.error("L'enregistrement n'a pas été confirmé à temps : vérifier la date avant de recommencer")
+        except sqlite3.Error as e:
+            st.error(f"Erreur de la base : {e}")
+        else:
+            st.success("Date de semence enregistrée")
+
+
+#Téléchargement du catalogue complet (fichiers écrits par blocs, sans charger toute la table)
+#Le fichier n'est écrit que pour le format demandé, puis réutilisé tant que la base ne change pas
+st.subheader("Exporter le catalogue complet")
+version = db.version_contenu()[:12]
+format_export = st.radio("Format", list(export.FORMATS_EXPORT), horizontal=True, key="format_catalogue")
+if export.chemin_fichier("catalogue", version, format_export).exists() or st.button("Préparer le fichier"):
+    chemin = export.preparer_fichier(
+        "catalogue", version, format_export, export.source_catalogue, types=export.types_variete()
+    )
+    with open(chemin, "rb") as fichier:
+        st.download_button(
+            f"⬇️ {format_export.upper()}",
+            data=fichier,
+            file_name=f"catalogue.{format_export}",
+            mime=export.FORMATS_EXPORT[format_export],
+        )
@@ -9,6 +9,7 @@ import streamlit as st
 import plotly.express as px
 
 from services import db
+from services import export_service as export
 from services import stats_service as serv
 
 
@@ -42,3 +43,19 @@ st.write(
 #Affichage du graphique de répartition par couleur
 st.plotly_chart(fig_couleur, use_container_width=True)
 st.dataframe(df_couleur)
+
+#Téléchargement des comptages (toutes les colonnes)
+st.subheader("Exporter les statistiques")
+version = db.version_contenu()[:12]
+format_export = st.radio("Format", list(export.FORMATS_EXPORT), horizontal=True, key="format_stats")
+if export.chemin_fichier("stats", version, format_export).exists() or st.button("Préparer le fichier"):
+    chemin = export.preparer_fichier(
+        "stats", version, format_export, export.source_stats, types=export.TYPES_STATS
+    )
+    with open(chemin, "rb") as fichier:
+        st.download_button(
+            f"⬇️ {format_export.upper()}",
+            data=fichier,
+            file_name=f"stats.{format_export}",
+            mime=export.FORMATS_EXPORT[format_export],
+        )
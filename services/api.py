@@ -0,0 +1,319 @@
+"""
+API JSON locale (lecture seule)
+Petit serveur HTTP asyncio, sans dépendance externe (bibliothèque standard),
+qui expose les données de la base aux outils internes :
+
+- GET /version                      -> version courante de la base
+- GET /catalogue?page=1&taille=50   -> une page du catalogue (taille <= 500)
+- GET /stats                        -> comptages pour toutes les colonnes
+- GET /stats/<colonne>              -> comptage pour une colonne (couleur, forme...)
+- GET /campagne?objectif=40&annee=2026&duree_vie=6 -> sélection de campagne
+      (option &indisponibles=12,34 : variétés remplacées par la plus similaire)
+- GET /similaires/<id>?k=10         -> variétés les plus proches d'une variété
+- GET /metriques                    -> compteurs des caches
+
+Les requêtes SQL passent par le pool partagé de connexions en lecture seule
+(services.db.obtenir_pool) ; si aucune connexion ne se libère à temps, la
+réponse est un 503. Les réponses sont mises en cache et portent un ETag
+lié à la version de la base : un client qui renvoie If-None-Match reçoit un 304
+tant que la base n'a pas changé.
+
+Lancement :
+    python -m services.api --port 8765
+"""
+
+#Importation des bibliothèques
+import argparse
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+from services import db
+from services import cache_selection
+from services import rotation_service as rotation
+from services import similarite_service as similarite
+from services import stats_service as stats
+
+
+#Taille maximale acceptée pour la ligne de requête et les en-têtes
+TAILLE_MAX_ENTETES = 64 * 1024
+
+STATUTS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+#Erreur renvoyée au client avec un code HTTP
+class ErreurHTTP(Exception):
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+        self.message = message
+
+
+#-----------------------------------------
+# CACHE DES REPONSES
+#-----------------------------------------
+
+class CacheReponses:
+    """
+    Cache LRU des réponses déjà calculées : cle -> (version, etag, corps).
+    Une entrée n'est valide que pour la version de la base qui l'a produite.
+    """
+
+    def __init__(self, taille_max=256):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lire(self, cle, version):
+        entree = self._entrees.get(cle)
+        if entree is None or entree[0] != version:
+            self.misses += 1
+            return None
+        self._entrees.move_to_end(cle)
+        self.hits += 1
+        return entree[1], entree[2]
+
+    def ecrire(self, cle, version, etag, corps):
+        self._entrees[cle] = (version, etag, corps)
+        self._entrees.move_to_end(cle)
+        while len(self._entrees) > self.taille_max:
+            self._entrees.popitem(last=False)
+
+
+#Calcul de l'ETag d'une réponse
+def calculer_etag(version, cle):
+    empreinte = hashlib.sha1(f"{version}|{cle}".encode("utf-8")).hexdigest()[:20]
+    return f'"{empreinte}"'
+
+
+#-----------------------------------------
+# SERVEUR
+#-----------------------------------------
+
+class ServeurAPI:
+    """Serveur HTTP/1.1 (keep-alive) qui répond en JSON."""
+
+    def __init__(self, db_path=None, taille_pool=4, taille_cache=256):
+        self.db_path = db_path or db.DB_PATH
+        self.pool = db.obtenir_pool(self.db_path, taille=taille_pool)
+        self.cache = CacheReponses(taille_cache)
+
+    #Lecture des paramètres entiers de la query string
+    @staticmethod
+    def _entier(params, nom, defaut):
+        valeur = params.get(nom, [defaut])[0]
+        try:
+            return int(valeur)
+        except (TypeError, ValueError):
+            raise ErreurHTTP(400, f"paramètre '{nom}' invalide : {valeur}")
+
+    #Routage (exécuté dans un thread : les requêtes SQL sont bloquantes)
+    def calculer(self, chemin, params):
+        morceaux = [m for m in chemin.split("/") if m]
+
+        if morceaux == ["catalogue"]:
+            taille = self._entier(params, "taille", 50)
+            if not 1 <= taille <= db.TAILLE_PAGE_MAX:
+                raise ErreurHTTP(400, f"paramètre 'taille' hors limites (1 à {db.TAILLE_PAGE_MAX}) : {taille}")
+            page = self._entier(params, "page", 1)
+            if not 1 <= page <= db.page_max(taille):
+                raise ErreurHTTP(400, f"paramètre 'page' hors limites (1 à {db.page_max(taille)}) : {page}")
+            with self.pool.connexion() as connexion:
+                varietes = db.lire_catalogue(connexion, page, taille)
+            return {"page": page, "taille": taille, "varietes": varietes}
+
+        if morceaux and morceaux[0] == "stats" and len(morceaux) <= 2:
+            colonnes = morceaux[1:] or list(stats.COLONNES_STATS)
+            try:
+                with self.pool.connexion() as connexion:
+                    return {c: stats.compter_par_colonne_sql(connexion, c) for c in colonnes}
+            except ValueError as e:
+                raise ErreurHTTP(404, str(e))
+
+        if morceaux == ["campagne"]:
+            objectif = self._entier(params, "objectif", rotation.OBJECTIF_DEFAUT)
+            annee = self._entier(params, "annee", rotation.ANNEE_CAMPAGNE_DEFAUT)
+            duree_vie = self._entier(params, "duree_vie", rotation.DUREE_VIE_DEFAUT)
+            selection, nb_trop_vieux = cache_selection.selectionner(
+                self.db_path, objectif=objectif, annee_campagne=annee, duree_vie=duree_vie
+            )
+            try:
+                indisponibles = [
+                    int(i) for valeur in params.get("indisponibles", []) for i in valeur.split(",") if i
+                ]
+            except ValueError:
+                raise ErreurHTTP(400, "paramètre 'indisponibles' invalide")
+            selection, remplacements = similarite.substituer_indisponibles(
+                selection, indisponibles, self.db_path
+            )
+            return {
+                "objectif": objectif,
+                "annee_campagne": annee,
+                "duree_vie": duree_vie,
+                "nb_trop_vieux": nb_trop_vieux,
+                "selection": selection,
+                "remplacements": remplacements,
+            }
+
+        if len(morceaux) == 2 and morceaux[0] == "similaires":
+            try:
+                id_variete = int(morceaux[1])
+            except ValueError:
+                raise ErreurHTTP(400, f"identifiant invalide : {morceaux[1]}")
+            k = self._entier(params, "k", 10)
+            if k < 1:
+                raise ErreurHTTP(400, f"paramètre 'k' invalide (au moins 1) : {k}")
+            if id_variete not in similarite.obtenir_index(self.db_path):
+                raise ErreurHTTP(404, f"variété inconnue : {id_variete}")
+            return {"id": id_variete, "similaires": similarite.varietes_similaires(id_variete, k, self.db_path)}
+
+        raise ErreurHTTP(404, f"ressource inconnue : {chemin}")
+
+    #Réponse à une requête GET (avec cache et ETag)
+    async def repondre(self, cible, entetes):
+        url = urlsplit(cible)
+        params = parse_qs(url.query)
+        version = db.version_base(self.db_path)
+
+        if url.path.rstrip("/") == "/version":
+            return 200, {"Cache-Control": "no-store"}, json.dumps({"version": version}).encode("utf-8")
+
+        if url.path.rstrip("/") == "/metriques":
+            metriques = {
+                "reponses": {"hits": self.cache.hits, "misses": self.cache.misses},
+                "selections": cache_selection.metriques(),
+            }
+            return 200, {"Cache-Control": "no-store"}, json.dumps(metriques).encode("utf-8")
+
+        #Clé de cache : chemin + paramètres triés
+        cle = url.path.rstrip("/") + "?" + "&".join(
+            f"{k}={v}" for k in sorted(params) for v in params[k]
+        )
+        etag = calculer_etag(version, cle)
+        en_tetes_cache = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if entetes.get("if-none-match") == etag:
+            return 304, en_tetes_cache, b""
+
+        en_cache = self.cache.lire(cle, version)
+        if en_cache is not None:
+            return 200, en_tetes_cache, en_cache[1]
+
+        try:
+            donnees = await asyncio.to_thread(self.calculer, url.path, params)
+        except db.PoolEpuise as e:
+            raise ErreurHTTP(503, f"base surchargée, réessayer plus tard ({e})")
+        corps = json.dumps(donnees, ensure_ascii=False, default=str).encode("utf-8")
+        self.cache.ecrire(cle, version, etag, corps)
+        return 200, en_tetes_cache, corps
+
+    #Gestion d'une connexion client (plusieurs requêtes possibles)
+    async def traiter_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    brut = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._envoyer(writer, 400, {}, b'{"erreur": "en-tetes trop longs"}', False)
+                    break
+
+                lignes = brut.decode("latin-1").split("\r\n")
+                try:
+                    methode, cible, protocole = lignes[0].split(" ", 2)
+                except ValueError:
+                    await self._envoyer(writer, 400, {}, b'{"erreur": "requete invalide"}', False)
+                    break
+
+                entetes = {}
+                for ligne in lignes[1:]:
+                    if ":" in ligne:
+                        nom, valeur = ligne.split(":", 1)
+                        entetes[nom.strip().lower()] = valeur.strip()
+
+                connexion_entete = entetes.get("connection", "").lower()
+                garder = (
+                    connexion_entete == "keep-alive"
+                    if protocole == "HTTP/1.0"
+                    else connexion_entete != "close"
+                )
+
+                if methode not in ("GET", "HEAD"):
+                    statut, en_tetes, corps = 405, {"Allow": "GET, HEAD"}, b'{"erreur": "methode non autorisee"}'
+                else:
+                    try:
+                        statut, en_tetes, corps = await self.repondre(cible, entetes)
+                    except ErreurHTTP as e:
+                        statut, en_tetes = e.statut, {}
+                        corps = json.dumps({"erreur": e.message}, ensure_ascii=False).encode("utf-8")
+                    except Exception as e:
+                        statut, en_tetes = 500, {}
+                        corps = json.dumps({"erreur": repr(e)}, ensure_ascii=False).encode("utf-8")
+
+                await self._envoyer(writer, statut, en_tetes, corps, garder, sans_corps=methode == "HEAD")
+                if not garder:
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _envoyer(writer, statut, en_tetes, corps, garder, sans_corps=False):
+        lignes = [f"HTTP/1.1 {statut} {STATUTS.get(statut, '')}"]
+        if statut != 304:
+            lignes.append("Content-Type: application/json; charset=utf-8")
+        lignes.append(f"Content-Length: {len(corps)}")
+        lignes.append(f"Connection: {'keep-alive' if garder else 'close'}")
+        lignes.extend(f"{k}: {v}" for k, v in en_tetes.items())
+        writer.write(("\r\n".join(lignes) + "\r\n\r\n").encode("latin-1"))
+        if not sans_corps:
+            writer.write(corps)
+        await writer.drain()
+
+    async def demarrer(self, hote="127.0.0.1", port=8765):
+        """Démarre l'écoute et retourne l'objet asyncio.Server."""
+        return await asyncio.start_server(self.traiter_client, hote, port, limit=TAILLE_MAX_ENTETES)
+
+    def fermer(self):
+        self.pool.fermer()
+
+
+async def servir(hote, port, db_path=None, taille_pool=4, taille_cache=256):
+    serveur_api = ServeurAPI(db_path, taille_pool=taille_pool, taille_cache=taille_cache)
+    serveur = await serveur_api.demarrer(hote, port)
+    print(f"API TomatoCycle : http://{hote}:{port} (base {serveur_api.db_path})")
+    try:
+        async with serveur:
+            await serveur.serve_forever()
+    finally:
+        serveur_api.fermer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API JSON locale (lecture seule) de TomatoCycle.")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", help="Base SQLite (défaut : base du projet).")
+    parser.add_argument("--pool", type=int, default=4, help="Nombre de connexions en lecture.")
+    parser.add_argument("--cache", type=int, default=256, help="Nombre de réponses gardées en cache.")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(servir(args.hote, args.port, args.db, args.pool, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
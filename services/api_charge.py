@@ -0,0 +1,147 @@
+"""
+Test de charge de l'API locale
+Lance plusieurs clients concurrents (connexions keep-alive) contre l'API
+et affiche le débit (requêtes/s) et les latences (p50, p99, max).
+
+Exemples :
+    python -m services.api_charge                       # démarre une API en interne
+    python -m services.api_charge --url http://127.0.0.1:8765 --clients 50 --duree 10
+    python -m services.api_charge --etag                # clients qui revalident avec If-None-Match
+"""
+
+#Importation des bibliothèques
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+from services.api import ServeurAPI
+
+
+#Chemins interrogés par défaut (mélange représentatif)
+CHEMINS_DEFAUT = [
+    "/catalogue?page=1&taille=50",
+    "/catalogue?page=2&taille=50",
+    "/catalogue?page=10&taille=100",
+    "/stats",
+    "/stats/couleur",
+    "/campagne?objectif=40&annee=2026",
+    "/campagne?objectif=80&annee=2027",
+]
+
+
+#Envoi d'une requête GET sur une connexion ouverte et lecture de la réponse
+async def requete_get(reader, writer, hote, chemin, etag=None):
+    entetes = f"GET {chemin} HTTP/1.1\r\nHost: {hote}\r\n"
+    if etag:
+        entetes += f"If-None-Match: {etag}\r\n"
+    writer.write((entetes + "\r\n").encode("latin-1"))
+    await writer.drain()
+
+    brut = await reader.readuntil(b"\r\n\r\n")
+    lignes = brut.decode("latin-1").split("\r\n")
+    statut = int(lignes[0].split(" ")[1])
+    reponse = {}
+    for ligne in lignes[1:]:
+        if ":" in ligne:
+            nom, valeur = ligne.split(":", 1)
+            reponse[nom.strip().lower()] = valeur.strip()
+    corps = await reader.readexactly(int(reponse.get("content-length", 0)))
+    return statut, reponse.get("etag"), corps
+
+
+#Un client : enchaîne des requêtes jusqu'à la fin du test
+async def client(hote, port, chemins, fin, latences, statuts, utiliser_etag):
+    reader, writer = await asyncio.open_connection(hote, port, limit=2**24)
+    etags = {}
+    try:
+        while time.perf_counter() < fin:
+            chemin = random.choice(chemins)
+            debut = time.perf_counter()
+            statut, etag, _ = await requete_get(
+                reader, writer, hote, chemin, etags.get(chemin) if utiliser_etag else None
+            )
+            latences.append(time.perf_counter() - debut)
+            statuts[statut] = statuts.get(statut, 0) + 1
+            if etag:
+                etags[chemin] = etag
+    finally:
+        writer.close()
+
+
+#Percentile simple sur une liste triée
+def percentile(valeurs_triees, p):
+    if not valeurs_triees:
+        return 0.0
+    indice = min(len(valeurs_triees) - 1, int(round(p / 100 * (len(valeurs_triees) - 1))))
+    return valeurs_triees[indice]
+
+
+async def lancer_test(url, nb_clients, duree, chemins, utiliser_etag, db_path=None):
+    serveur = None
+    serveur_api = None
+    if url is None:
+        #Pas d'URL : on démarre une API dans le même processus
+        serveur_api = ServeurAPI(db_path)
+        serveur = await serveur_api.demarrer("127.0.0.1", 0)
+        hote, port = serveur.sockets[0].getsockname()[:2]
+    else:
+        decoupe = urlsplit(url)
+        hote, port = decoupe.hostname, decoupe.port or 80
+
+    latences = []
+    statuts = {}
+    debut = time.perf_counter()
+    fin = debut + duree
+    try:
+        await asyncio.gather(*(
+            client(hote, port, chemins, fin, latences, statuts, utiliser_etag)
+            for _ in range(nb_clients)
+        ))
+    finally:
+        ecoule = time.perf_counter() - debut
+        if serveur is not None:
+            serveur.close()
+            await serveur.wait_closed()
+            serveur_api.fermer()
+
+    latences.sort()
+    return {
+        "requetes": len(latences),
+        "debit": len(latences) / ecoule if ecoule else 0.0,
+        "p50_ms": percentile(latences, 50) * 1000,
+        "p99_ms": percentile(latences, 99) * 1000,
+        "max_ms": (latences[-1] if latences else 0.0) * 1000,
+        "statuts": statuts,
+        "cache": (serveur_api.cache.hits, serveur_api.cache.misses) if serveur_api else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge de l'API TomatoCycle.")
+    parser.add_argument("--url", help="URL d'une API déjà lancée (défaut : API démarrée en interne).")
+    parser.add_argument("--db", help="Base SQLite pour l'API interne.")
+    parser.add_argument("--clients", type=int, default=20, help="Nombre de clients concurrents.")
+    parser.add_argument("--duree", type=float, default=5.0, help="Durée du test en secondes.")
+    parser.add_argument("--chemin", action="append", help="Chemin à interroger (répétable).")
+    parser.add_argument("--etag", action="store_true", help="Revalider avec If-None-Match.")
+    args = parser.parse_args(argv)
+
+    resultat = asyncio.run(lancer_test(
+        args.url, args.clients, args.duree, args.chemin or CHEMINS_DEFAUT, args.etag, args.db
+    ))
+
+    print(f"requêtes   : {resultat['requetes']}")
+    print(f"débit      : {resultat['debit']:.0f} req/s")
+    print(f"latence p50: {resultat['p50_ms']:.2f} ms")
+    print(f"latence p99: {resultat['p99_ms']:.2f} ms")
+    print(f"latence max: {resultat['max_ms']:.2f} ms")
+    print(f"statuts    : {resultat['statuts']}")
+    if resultat["cache"]:
+        print(f"cache      : {resultat['cache'][0]} hits / {resultat['cache'][1]} misses")
+    return resultat
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Cache des sélections de campagne
+Une sélection ne dépend que du contenu du catalogue et des paramètres
+de la campagne : on la mémorise avec la clé
+    (version du contenu, objectif, année de campagne, durée de vie, algorithme)
+
+Deux niveaux :
+- un cache LRU en mémoire (partagé par les pages, l'API et les scripts du processus)
+- un cache sur disque optionnel (un fichier JSON par sélection) qui survit
+  aux redémarrages. Il est activé en passant un dossier, ou avec la variable
+  d'environnement TOMATOCYCLE_CACHE_DIR. Il est lui aussi borné : au-delà de
+  `taille_max_disque` fichiers, les moins récemment utilisés sont supprimés
+  (les sélections des anciennes versions du catalogue disparaissent ainsi).
+
+Les compteurs hits / misses sont disponibles via `metriques()`.
+"""
+
+#Importation des bibliothèques
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from services import db
+from services import rotation_service as rotation
+
+
+#-----------------------------------------
+# CACHE
+#-----------------------------------------
+
+class CacheSelection:
+    """Cache LRU des sélections, avec niveau disque optionnel."""
+
+    def __init__(self, taille_max=128, dossier=None, taille_max_disque=1000):
+        self.taille_max = taille_max
+        self.taille_max_disque = taille_max_disque
+        self.dossier = Path(dossier) if dossier else None
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self._compteurs = {"hits_memoire": 0, "hits_disque": 0, "misses": 0}
+
+    #Clé de cache
+    @staticmethod
+    def cle(version, objectif, annee_campagne, duree_vie, algorithme=rotation.ALGORITHME):
+        return (version, int(objectif), int(annee_campagne), int(duree_vie), algorithme)
+
+    def _chemin_disque(self, cle):
+        empreinte = hashlib.sha1(json.dumps(cle).encode("utf-8")).hexdigest()
+        return self.dossier / f"selection_{empreinte}.json"
+
+    def _lire_disque(self, cle):
+        if self.dossier is None:
+            return None
+        chemin = self._chemin_disque(cle)
+        try:
+            contenu = json.loads(chemin.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        #Protection contre une collision ou un fichier d'une autre version
+        if tuple(contenu.get("cle", ())) != cle:
+            return None
+        #La date de modification sert d'ordre LRU pour le nettoyage
+        try:
+            os.utime(chemin)
+        except OSError:
+            pass
+        return contenu["selection"], contenu["nb_trop_vieux"]
+
+    def _ecrire_disque(self, cle, valeur):
+        if self.dossier is None:
+            return
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        chemin = self._chemin_disque(cle)
+        #Écriture atomique : fichier temporaire puis renommage
+        temporaire = chemin.with_name(f"{chemin.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temporaire.write_text(
+            json.dumps(
+                {"cle": list(cle), "selection": valeur[0], "nb_trop_vieux": valeur[1]},
+                ensure_ascii=False,
+                default=str,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(temporaire, chemin)
+        self._nettoyer_disque()
+
+    #Suppression des fichiers les moins récemment utilisés au-delà de taille_max_disque
+    def _nettoyer_disque(self):
+        fichiers = []
+        for chemin in self.dossier.glob("selection_*.json"):
+            try:
+                fichiers.append((chemin.stat().st_mtime_ns, chemin))
+            except FileNotFoundError:
+                continue
+        if len(fichiers) <= self.taille_max_disque:
+            return
+        fichiers.sort()
+        for _, chemin in fichiers[: len(fichiers) - self.taille_max_disque]:
+            try:
+                chemin.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _memoriser(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def obtenir(self, cle, calculer):
+        """
+        Retourne (selection, nb_trop_vieux) pour la clé donnée.
+        `calculer` n'est appelé qu'en cas d'absence dans les deux niveaux.
+        """
+        with self._verrou:
+            valeur = self._entrees.get(cle)
+            if valeur is not None:
+                self._entrees.move_to_end(cle)
+                self._compteurs["hits_memoire"] += 1
+        if valeur is None:
+            valeur = self._lire_disque(cle)
+            if valeur is not None:
+                with self._verrou:
+                    self._compteurs["hits_disque"] += 1
+                self._memoriser(cle, valeur)
+        if valeur is None:
+            with self._verrou:
+                self._compteurs["misses"] += 1
+            valeur = calculer()
+            self._memoriser(cle, valeur)
+            self._ecrire_disque(cle, valeur)
+
+        #Copie : l'appelant peut modifier la sélection sans abîmer le cache
+        selection, nb_trop_vieux = valeur
+        return [dict(v) for v in selection], nb_trop_vieux
+
+    def vider(self):
+        """Vide le niveau mémoire (le niveau disque est conservé)."""
+        with self._verrou:
+            self._entrees.clear()
+
+    def metriques(self):
+        with self._verrou:
+            compteurs = dict(self._compteurs)
+            compteurs["taille"] = len(self._entrees)
+        total = compteurs["hits_memoire"] + compteurs["hits_disque"] + compteurs["misses"]
+        compteurs["taux_hit"] = (
+            (compteurs["hits_memoire"] + compteurs["hits_disque"]) / total if total else 0.0
+        )
+        compteurs["disque"] = str(self.dossier) if self.dossier else None
+        return compteurs
+
+
+#Cache partagé par le processus
+CACHE = CacheSelection(dossier=os.getenv("TOMATOCYCLE_CACHE_DIR") or None)
+
+
+#-----------------------------------------
+# FONCTIONS
+#-----------------------------------------
+
+def selectionner(
+    db_path=None,
+    objectif=rotation.OBJECTIF_DEFAUT,
+    annee_campagne=rotation.ANNEE_CAMPAGNE_DEFAUT,
+    duree_vie=rotation.DUREE_VIE_DEFAUT,
+    cache=None,
+):
+    """
+    Sélection de campagne pour la base donnée, servie depuis le cache si possible.
+    Le catalogue n'est chargé qu'en cas de miss.
+    """
+    cache = cache or CACHE
+    cle = cache.cle(db.version_contenu(db_path), objectif, annee_campagne, duree_vie)
+
+    def calculer():
+        with db.obtenir_pool(db_path).connexion() as connexion:
+            varietes = [dict(ligne) for ligne in connexion.execute("SELECT * FROM variete")]
+            groupes_doublons = db.charger_doublons(connexion)
+        return rotation.selectionner_varietes(
+            varietes,
+            objectif=objectif,
+            annee_campagne=annee_campagne,
+            duree_vie=duree_vie,
+            groupes_doublons=groupes_doublons,
+        )
+
+    return cache.obtenir(cle, calculer)
+
+
+def metriques():
+    """Compteurs du cache partagé."""
+    return CACHE.metriques()
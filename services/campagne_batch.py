@@ -0,0 +1,237 @@
+"""
+Campagnes en lot (sans Streamlit)
+Ce module permet de lancer une ou plusieurs sélections de campagne
+depuis la ligne de commande (tâches planifiées, scripts) :
+- sur une ou plusieurs bases SQLite
+- pour un ou plusieurs jeux de paramètres (objectif, année, durée de vie)
+- avec écriture des résultats en JSON, CSV, XLSX, Parquet et/ou PDF
+
+Exemples :
+    python -m services.campagne_batch --objectif 40 --annee 2026
+    python -m services.campagne_batch --db a.db --db b.db --objectif 40 --objectif 60 --formats json,csv
+    python -m services.campagne_batch --plan plan.json --sortie exports/nuit
+
+Le fichier plan est une liste JSON de campagnes, par exemple :
+    [{"db": "data/tomatocycle.db", "objectif": 40, "annee_campagne": 2026, "duree_vie": 6}]
+"""
+
+#Importation des bibliothèques
+import argparse
+import json
+import time
+from itertools import product
+from pathlib import Path
+
+from services import cache_selection
+from services import db
+from services import export_service as export
+from services import rotation_service as rotation
+
+
+#Formats de sortie disponibles
+FORMATS = ("json", *export.FORMATS_EXPORT, "pdf")
+
+
+#-----------------------------------------
+# FONCTIONS
+#-----------------------------------------
+
+#Construction de la liste des campagnes à lancer
+def construire_campagnes(db_paths, objectifs, annees, durees_vie):
+    """
+    Produit toutes les combinaisons (base, objectif, année, durée de vie).
+    """
+    return [
+        {"db": str(p), "objectif": o, "annee_campagne": a, "duree_vie": d}
+        for p, o, a, d in product(db_paths, objectifs, annees, durees_vie)
+    ]
+
+
+#Un nom de campagne devient un nom de fichier : il doit rester dans le dossier de sortie
+def verifier_nom_fichier(nom):
+    if (
+        not isinstance(nom, str)
+        or nom in ("", ".", "..")
+        or "/" in nom
+        or "\\" in nom
+        or Path(nom).name != nom
+    ):
+        raise ValueError(f"nom de campagne invalide (pas de chemin autorisé) : {nom!r}")
+    return nom
+
+
+#Lecture d'un fichier plan JSON
+def lire_plan(plan_path):
+    """
+    Lit un plan de campagnes et complète les valeurs manquantes.
+    Lève ValueError si un "nom" n'est pas un simple nom de fichier.
+    """
+    campagnes = json.loads(Path(plan_path).read_text(encoding="utf-8"))
+    return [
+        {
+            "db": str(c.get("db", db.DB_PATH)),
+            "objectif": int(c.get("objectif", rotation.OBJECTIF_DEFAUT)),
+            "annee_campagne": int(c.get("annee_campagne", rotation.ANNEE_CAMPAGNE_DEFAUT)),
+            "duree_vie": int(c.get("duree_vie", rotation.DUREE_VIE_DEFAUT)),
+            **({"nom": verifier_nom_fichier(c["nom"])} if "nom" in c else {}),
+        }
+        for c in campagnes
+    ]
+
+
+#Nom de fichier d'une campagne (unique dans un lot)
+def nom_campagne(campagne):
+    if "nom" in campagne:
+        return campagne["nom"]
+    return (
+        f"campagne_{campagne['annee_campagne']}_{Path(campagne['db']).stem}"
+        f"_obj{campagne['objectif']}_dv{campagne['duree_vie']}"
+    )
+
+
+#Deux campagnes du lot ne doivent pas écrire dans les mêmes fichiers
+def verifier_noms(campagnes):
+    """Lève ValueError si plusieurs campagnes ont le même nom de fichier."""
+    vus = set()
+    for campagne in campagnes:
+        nom = nom_campagne(campagne)
+        if nom in vus:
+            raise ValueError(f"plusieurs campagnes portent le nom '{nom}'")
+        vus.add(nom)
+
+
+#Écriture des résultats d'une campagne
+def ecrire_resultats(campagne, selection, nb_trop_vieux, sortie, formats):
+    """Écrit la sélection dans les formats demandés et retourne les chemins créés."""
+    sortie = Path(sortie)
+    sortie.mkdir(parents=True, exist_ok=True)
+    nom = nom_campagne(campagne)
+    lignes = [{col: v.get(col) for col in export.COLONNES_SELECTION} for v in selection]
+    chemins = []
+
+    if "json" in formats:
+        json_path = sortie / f"{nom}.json"
+        json_path.write_text(
+            json.dumps(
+                {**campagne, "nb_trop_vieux": nb_trop_vieux, "selection": lignes},
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        chemins.append(json_path)
+
+    #Types des colonnes (Parquet) : lus une seule fois, pas pour chaque format
+    types = export.types_variete(campagne["db"]) if "parquet" in formats else None
+    for format_export in export.FORMATS_EXPORT:
+        if format_export in formats:
+            chemins.append(
+                export.exporter(
+                    export.source_selection(selection),
+                    format_export,
+                    sortie / f"{nom}.{format_export}",
+                    types=types,
+                )
+            )
+
+    if "pdf" in formats:
+        #Import local : reportlab n'est chargé que si un PDF est demandé
+        from services import pdf_service as pdfserv
+
+        chemins.append(
+            pdfserv.exporter_selection_pdf(
+                selection, campagne["annee_campagne"], export_dir=sortie, nom_fichier=f"{nom}.pdf"
+            )
+        )
+
+    return chemins
+
+
+#Lancement d'un lot de campagnes
+def lancer_lot(campagnes, sortie="exports", formats=("json",)):
+    """
+    Lance toutes les campagnes du lot.
+    Les sélections passent par le cache (services.cache_selection) : une campagne
+    déjà calculée pour le même contenu de base n'est pas recalculée.
+    Retourne un résumé par campagne.
+    """
+    verifier_noms(campagnes)
+    resume = []
+
+    for campagne in campagnes:
+        debut = time.perf_counter()
+
+        selection, nb_trop_vieux = cache_selection.selectionner(
+            campagne["db"],
+            objectif=campagne["objectif"],
+            annee_campagne=campagne["annee_campagne"],
+            duree_vie=campagne["duree_vie"],
+        )
+        chemins = ecrire_resultats(campagne, selection, nb_trop_vieux, sortie, formats)
+
+        resume.append({
+            **campagne,
+            "nb_selection": len(selection),
+            "nb_trop_vieux": nb_trop_vieux,
+            "fichiers": [str(c) for c in chemins],
+            "duree_s": round(time.perf_counter() - debut, 4),
+        })
+
+    return resume
+
+
+#Lecture des arguments de la ligne de commande
+def parser_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Sélection de campagnes TomatoCycle en lot (sans Streamlit).")
+    parser.add_argument("--db", action="append", help="Base SQLite (répétable). Défaut : base du projet.")
+    parser.add_argument("--objectif", type=int, action="append", help="Nombre de variétés (répétable).")
+    parser.add_argument("--annee", type=int, action="append", help="Année de campagne (répétable).")
+    parser.add_argument("--duree-vie", type=int, action="append", help="Durée de vie des semences (répétable).")
+    parser.add_argument("--plan", help="Fichier JSON listant les campagnes (remplace les options ci-dessus).")
+    parser.add_argument("--sortie", default="exports", help="Dossier de sortie (défaut : exports).")
+    parser.add_argument("--formats", default="json", help=f"Formats séparés par des virgules : {','.join(FORMATS)}.")
+    parser.add_argument("--cache", help="Dossier du cache disque des sélections (défaut : TOMATOCYCLE_CACHE_DIR).")
+    args = parser.parse_args(argv)
+
+    args.formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    inconnus = set(args.formats) - set(FORMATS)
+    if inconnus:
+        parser.error(f"format(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+    return args
+
+
+def main(argv=None):
+    args = parser_arguments(argv)
+    if args.cache:
+        cache_selection.CACHE.dossier = Path(args.cache)
+
+    if args.plan:
+        try:
+            campagnes = lire_plan(args.plan)
+        except ValueError as e:
+            raise SystemExit(f"erreur : {e}")
+    else:
+        campagnes = construire_campagnes(
+            args.db or [db.DB_PATH],
+            args.objectif or [rotation.OBJECTIF_DEFAUT],
+            args.annee or [rotation.ANNEE_CAMPAGNE_DEFAUT],
+            args.duree_vie or [rotation.DUREE_VIE_DEFAUT],
+        )
+
+    try:
+        resume = lancer_lot(campagnes, sortie=args.sortie, formats=args.formats)
+    except ValueError as e:
+        raise SystemExit(f"erreur : {e}")
+
+    for r in resume:
+        print(
+            f"{nom_campagne(r)} : {r['nb_selection']} variétés, "
+            f"{r['nb_trop_vieux']} semences trop vieilles ({r['duree_s']} s)"
+        )
+    print(f"{len(resume)} campagne(s) traitée(s) -> {args.sortie}")
+    print(f"cache des sélections : {cache_selection.metriques()}")
+    return resume
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,17 @@ Service d'accès à la base de données
 Ce module centralise toutes les fonctions liées :
 - à la connexion à la base de données 
 - au chargement des données utilisées par l'application
+- au partage de connexions en lecture seule (pool) entre les pages et l'API
 """
 
 #Importation des bibliothèques
+import hashlib
 import os
+from contextlib import contextmanager
 from pathlib import Path
+import queue
 import sqlite3
-import pandas as pd
+import threading
 
 #Variables
 # Chemin "racine projet" (TomatoCycle/)
@@ -27,12 +31,212 @@ DB_PATH = Path(os.getenv("TOMATOCYCLE_DB_PATH", str(DEFAULT_DB_PATH)))
 #-----------------------------------------
 
 #On charge les données
-def charger_donnees():
+def charger_donnees(db_path=None):
     """
     Charge la table 'variete' depuis la base SQLite
     et la retourne sous forme de DataFrame pandas.
     """
-    connexion = sqlite3.connect(str(DB_PATH))
-    df_variete = pd.read_sql_query("SELECT * FROM variete", connexion)
-    connexion.close()
-    return df_variete
\ No newline at end of file
+    #Import local : les scripts sans interface n'ont pas à charger pandas
+    import pandas as pd
+
+    with obtenir_pool(db_path).connexion() as connexion:
+        return pd.read_sql_query("SELECT * FROM variete", connexion)
+
+
+#On charge les données sans pandas (scripts, tâches planifiées)
+def charger_varietes(db_path=None):
+    """
+    Charge la table 'variete' depuis la base SQLite
+    et la retourne sous forme de liste de dictionnaires.
+    """
+    return obtenir_pool(db_path).requete("SELECT * FROM variete")
+
+
+#Version de la base (change à chaque écriture)
+def version_base(db_path=None):
+    """
+    Retourne une empreinte de la base construite à partir de la date de
+    modification et de la taille du fichier (et du journal WAL s'il existe).
+    Elle change dès que la base est modifiée : on s'en sert pour les ETag
+    et pour invalider les caches.
+    """
+    chemin = Path(db_path or DB_PATH)
+    morceaux = []
+    for fichier in (chemin, chemin.with_name(chemin.name + "-wal")):
+        try:
+            st = fichier.stat()
+        except FileNotFoundError:
+            continue
+        morceaux.append(f"{st.st_mtime_ns:x}-{st.st_size:x}")
+    return ".".join(morceaux)
+
+
+#Version du contenu de la table 'variete' (mémorisée tant que le fichier ne change pas)
+_VERSIONS_CONTENU = {}
+_VERSIONS_VERROU = threading.Lock()
+
+
+def version_contenu(db_path=None):
+    """
+    Retourne une empreinte (sha1) du contenu de la table 'variete'.
+    Contrairement à version_base, elle ne change que si les données changent
+    réellement. Le calcul n'est refait que lorsque version_base change.
+    """
+    chemin = Path(db_path or DB_PATH).resolve()
+    version_fichier = version_base(chemin)
+    with _VERSIONS_VERROU:
+        memo = _VERSIONS_CONTENU.get(chemin)
+    if memo is not None and memo[0] == version_fichier:
+        return memo[1]
+
+    empreinte = hashlib.sha1()
+    with obtenir_pool(chemin).connexion() as connexion:
+        for ligne in connexion.execute("SELECT * FROM variete ORDER BY id"):
+            empreinte.update(repr(tuple(ligne)).encode("utf-8"))
+        #Les groupes de doublons influencent aussi la sélection
+        for id_source, id_cluster in sorted(charger_doublons(connexion).items()):
+            empreinte.update(f"d{id_source}:{id_cluster}".encode("utf-8"))
+    version = empreinte.hexdigest()
+
+    with _VERSIONS_VERROU:
+        _VERSIONS_CONTENU[chemin] = (version_fichier, version)
+    return version
+
+
+#Groupes de quasi-doublons détectés à l'import
+def charger_doublons(connexion):
+    """
+    Retourne {id_source: id_cluster} depuis la table 'doublon_variete'
+    (dictionnaire vide si la table n'existe pas encore dans cette base).
+    """
+    try:
+        curseur = connexion.execute("SELECT id_source, id_cluster FROM doublon_variete")
+    except sqlite3.OperationalError:
+        return {}
+    return {id_source: id_cluster for id_source, id_cluster in curseur}
+
+
+#Taille maximale d'une page du catalogue
+TAILLE_PAGE_MAX = 500
+
+#Plus grand entier accepté par SQLite (LIMIT / OFFSET)
+ENTIER_SQLITE_MAX = 2**63 - 1
+
+
+#Dernier numéro de page dont l'OFFSET reste un entier SQLite
+def page_max(taille_page):
+    return ENTIER_SQLITE_MAX // taille_page + 1
+
+
+#Lecture d'une page du catalogue
+def lire_catalogue(connexion, page=1, taille_page=50):
+    """
+    Retourne une page de la table 'variete' (liste de dictionnaires).
+    taille_page est ramenée entre 1 et TAILLE_PAGE_MAX, page entre 1 et page_max().
+    """
+    taille_page = min(TAILLE_PAGE_MAX, max(1, int(taille_page)))
+    page = min(page_max(taille_page), max(1, int(page)))
+    curseur = connexion.execute(
+        "SELECT * FROM variete ORDER BY id LIMIT ? OFFSET ?",
+        (taille_page, (page - 1) * taille_page),
+    )
+    colonnes = [c[0] for c in curseur.description]
+    return [dict(zip(colonnes, ligne)) for ligne in curseur]
+
+
+#-----------------------------------------
+# POOL DE CONNEXIONS EN LECTURE SEULE
+#-----------------------------------------
+
+#Aucune connexion rendue au pool avant la fin du délai d'attente
+class PoolEpuise(Exception):
+    pass
+
+
+class PoolLecture:
+    """
+    Pool de connexions SQLite ouvertes en lecture seule (mode=ro).
+    Les connexions sont créées à la demande (au plus `taille`) puis réutilisées ;
+    elles peuvent être utilisées depuis n'importe quel thread.
+    """
+
+    def __init__(self, db_path=None, taille=4, timeout=30.0):
+        self.db_path = Path(db_path or DB_PATH)
+        self.taille = taille
+        self.timeout = timeout
+        self._libres = queue.LifoQueue()
+        self._nb_ouvertes = 0
+        self._verrou = threading.Lock()
+
+    def _ouvrir(self):
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        connexion = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=self.timeout)
+        connexion.row_factory = sqlite3.Row
+        return connexion
+
+    @contextmanager
+    def connexion(self):
+        """Emprunte une connexion du pool le temps d'un bloc `with`."""
+        try:
+            connexion = self._libres.get_nowait()
+        except queue.Empty:
+            with self._verrou:
+                creer = self._nb_ouvertes < self.taille
+                if creer:
+                    self._nb_ouvertes += 1
+            if creer:
+                try:
+                    connexion = self._ouvrir()
+                except Exception:
+                    with self._verrou:
+                        self._nb_ouvertes -= 1
+                    raise
+            else:
+                #Pool plein : on attend qu'une connexion soit rendue
+                try:
+                    connexion = self._libres.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolEpuise(
+                        f"aucune connexion libre après {self.timeout:g} s ({self.taille} connexions)"
+                    ) from None
+        try:
+            yield connexion
+        finally:
+            self._libres.put(connexion)
+
+    def requete(self, sql, params=()):
+        """Exécute une requête SELECT et retourne une liste de dictionnaires."""
+        with self.connexion() as connexion:
+            return [dict(ligne) for ligne in connexion.execute(sql, params)]
+
+    def fermer(self):
+        """Ferme toutes les connexions actuellement libres."""
+        while True:
+            try:
+                connexion = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            connexion.close()
+            with self._verrou:
+                self._nb_ouvertes -= 1
+
+
+#Pools partagés par chemin de base (un seul pool par processus et par base)
+_POOLS = {}
+_POOLS_VERROU = threading.Lock()
+
+
+def obtenir_pool(db_path=None, taille=4):
+    """
+    Retourne le pool de lecture partagé pour la base demandée.
+    Si le pool existe déjà avec moins de connexions, sa taille est augmentée.
+    """
+    chemin = Path(db_path or DB_PATH).resolve()
+    with _POOLS_VERROU:
+        pool = _POOLS.get(chemin)
+        if pool is None:
+            pool = _POOLS[chemin] = PoolLecture(chemin, taille=taille)
+        elif pool.taille < taille:
+            with pool._verrou:
+                pool.taille = taille
+        return pool
@@ -0,0 +1,167 @@
+"""
+Test de charge des écritures
+Simule plusieurs bénévoles qui modifient la base en même temps pendant que
+d'autres la lisent, et mesure le nombre d'écritures par seconde.
+
+Le test travaille sur une COPIE de la base (dossier temporaire) : la base du
+projet n'est jamais modifiée. La copie est passée en WAL dans les deux modes,
+pour que seule la stratégie d'écriture change.
+
+Modes :
+- coordinateur : toutes les écritures passent par CoordinateurEcriture (lots)
+- direct       : chaque écriture ouvre sa connexion et commite (ancienne méthode),
+                 pour comparaison
+
+Les résultats dépendent beaucoup de la machine (nombre de cœurs, disque) :
+la configuration est affichée avec les mesures.
+
+Exemples :
+    python -m services.ecriture_charge --ecrivains 16 --duree 5
+    python -m services.ecriture_charge --mode direct --ecrivains 16 --duree 5
+    python -m services.ecriture_charge --synchronous FULL
+"""
+
+#Importation des bibliothèques
+import argparse
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from services import db
+from services.ecriture_service import CoordinateurEcriture, FilePleine
+
+
+SQL_MISE_A_JOUR = "UPDATE variete SET date_semence = ? WHERE id = ?"
+
+
+#Percentile simple sur une liste triée
+def percentile(valeurs_triees, p):
+    if not valeurs_triees:
+        return 0.0
+    indice = min(len(valeurs_triees) - 1, int(round(p / 100 * (len(valeurs_triees) - 1))))
+    return valeurs_triees[indice]
+
+
+#Un bénévole : enchaîne les mises à jour de dates de semence
+def ecrivain(ecrire, ids, fin, latences, erreurs):
+    while time.perf_counter() < fin:
+        params = (str(random.randint(2020, 2026)), random.choice(ids))
+        debut = time.perf_counter()
+        try:
+            ecrire(params)
+        except (sqlite3.OperationalError, FilePleine) as e:
+            erreurs.append(repr(e))
+            continue
+        latences.append(time.perf_counter() - debut)
+
+
+#Un lecteur : pages du catalogue via le pool en lecture seule
+def lecteur(pool, fin, latences):
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        with pool.connexion() as connexion:
+            db.lire_catalogue(connexion, page=random.randint(1, 60), taille_page=50)
+        latences.append(time.perf_counter() - debut)
+
+
+def lancer_test(db_source, mode, nb_ecrivains, nb_lecteurs, duree, synchronous):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = Path(dossier) / "charge.db"
+        shutil.copy(db_source, chemin)
+        connexion = sqlite3.connect(chemin)
+        #Mode WAL (persistant dans le fichier) : mêmes conditions de lecture pour les deux modes
+        connexion.execute("PRAGMA journal_mode=WAL")
+        ids = [ligne[0] for ligne in connexion.execute("SELECT id FROM variete")]
+        connexion.close()
+
+        coordinateur = None
+        if mode == "coordinateur":
+            coordinateur = CoordinateurEcriture(chemin, synchronous=synchronous)
+
+            def ecrire(params):
+                #Chaque bénévole attend la confirmation de son écriture (commit)
+                coordinateur.soumettre(SQL_MISE_A_JOUR, params).result()
+        else:
+            def ecrire(params):
+                with sqlite3.connect(chemin, timeout=5.0) as connexion:
+                    connexion.execute(f"PRAGMA synchronous={synchronous}")
+                    connexion.execute(SQL_MISE_A_JOUR, params)
+                connexion.close()
+
+        pool = db.PoolLecture(chemin, taille=max(1, nb_lecteurs))
+        latences_ecriture, latences_lecture, erreurs = [], [], []
+        fin = time.perf_counter() + duree
+        threads = [
+            threading.Thread(target=ecrivain, args=(ecrire, ids, fin, latences_ecriture, erreurs))
+            for _ in range(nb_ecrivains)
+        ] + [
+            threading.Thread(target=lecteur, args=(pool, fin, latences_lecture))
+            for _ in range(nb_lecteurs)
+        ]
+        debut = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ecoule = time.perf_counter() - debut
+
+        metriques = coordinateur.metriques() if coordinateur else None
+        if coordinateur:
+            coordinateur.fermer()
+        pool.fermer()
+
+    latences_ecriture.sort()
+    latences_lecture.sort()
+    return {
+        "ecritures": len(latences_ecriture),
+        "ecritures_par_s": len(latences_ecriture) / ecoule,
+        "ecriture_p99_ms": percentile(latences_ecriture, 99) * 1000,
+        "lectures": len(latences_lecture),
+        "lecture_p99_ms": percentile(latences_lecture, 99) * 1000,
+        "erreurs": len(erreurs),
+        "exemple_erreur": erreurs[0] if erreurs else None,
+        "coordinateur": metriques,
+    }
+
+
+#Description de la machine, affichée avec les résultats
+def decrire_machine():
+    return (
+        f"{platform.system()} {platform.release()} {platform.machine()}, "
+        f"{os.cpu_count()} CPU, Python {platform.python_version()}, SQLite {sqlite3.sqlite_version}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge des écritures concurrentes.")
+    parser.add_argument("--db", default=str(db.DB_PATH), help="Base copiée pour le test.")
+    parser.add_argument("--mode", choices=("coordinateur", "direct"), default="coordinateur")
+    parser.add_argument("--ecrivains", type=int, default=16, help="Nombre de bénévoles qui écrivent.")
+    parser.add_argument("--lecteurs", type=int, default=4, help="Nombre de lecteurs simultanés.")
+    parser.add_argument("--duree", type=float, default=5.0, help="Durée du test en secondes.")
+    parser.add_argument("--synchronous", default="NORMAL", help="OFF, NORMAL, FULL ou EXTRA.")
+    args = parser.parse_args(argv)
+
+    r = lancer_test(args.db, args.mode, args.ecrivains, args.lecteurs, args.duree, args.synchronous.upper())
+
+    print(f"machine          : {decrire_machine()}")
+    print(f"mode             : {args.mode} (synchronous={args.synchronous.upper()}, "
+          f"{args.ecrivains} écrivains, {args.lecteurs} lecteurs)")
+    print(f"écritures        : {r['ecritures']} ({r['ecritures_par_s']:.0f} /s)")
+    print(f"écriture p99     : {r['ecriture_p99_ms']:.2f} ms")
+    print(f"lectures         : {r['lectures']} (p99 {r['lecture_p99_ms']:.2f} ms)")
+    print(f"erreurs          : {r['erreurs']}" + (f" ex. {r['exemple_erreur']}" if r["erreurs"] else ""))
+    if r["coordinateur"]:
+        c = r["coordinateur"]
+        print(f"transactions     : {c['transactions']} (lot moyen {c['taille_moyenne_lot']:.1f})")
+    return r
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Service Écriture
+Coordinateur des écritures dans la base SQLite.
+
+Plusieurs bénévoles peuvent modifier la base en même temps (dates de semence,
+résultats...). Au lieu d'ouvrir chacun une connexion en écriture (risque de
+"database is locked" et un fsync par écriture), toutes les modifications passent
+par un seul thread écrivain :
+
+- il possède l'unique connexion en lecture-écriture
+- la base est en mode WAL : les lecteurs (pool en lecture seule) ne sont jamais bloqués
+- les modifications en attente sont regroupées dans une même transaction
+  (un seul commit / fsync pour tout le lot) ; chacune a son SAVEPOINT,
+  donc une modification en erreur n'annule pas les autres. Le lot est commité
+  dès que la file est vide : les modifications qui arrivent pendant un commit
+  forment le lot suivant
+- la file d'attente est bornée : quand elle est pleine, `soumettre` attend
+  (ou lève FilePleine si on ne veut pas attendre) -> contre-pression
+- `synchronous` règle la durabilité : "FULL" (fsync à chaque commit),
+  "NORMAL" (défaut en WAL, sûr en cas de crash de l'application) ou "OFF"
+
+Chaque modification soumise retourne un Future, résolu une fois le lot commité.
+Si le coordinateur s'arrête (fermer() ou erreur inattendue du thread écrivain),
+les modifications encore en file échouent avec CoordinateurArrete.
+"""
+
+#Importation des bibliothèques
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from services import db
+
+
+#Niveaux de durabilité acceptés (PRAGMA synchronous)
+NIVEAUX_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+#File d'attente pleine (contre-pression)
+class FilePleine(Exception):
+    pass
+
+
+#Coordinateur arrêté
+class CoordinateurArrete(Exception):
+    pass
+
+
+#Marqueur d'arrêt du thread écrivain
+_ARRET = object()
+
+
+#-----------------------------------------
+# COORDINATEUR
+#-----------------------------------------
+
+class CoordinateurEcriture:
+    """Thread écrivain unique avec regroupement des modifications en transactions."""
+
+    def __init__(
+        self,
+        db_path=None,
+        taille_file=10_000,
+        taille_lot=500,
+        delai_lot=0.0,
+        synchronous="NORMAL",
+    ):
+        if synchronous.upper() not in NIVEAUX_SYNCHRONOUS:
+            raise ValueError(f"synchronous invalide : {synchronous}")
+        self.db_path = Path(db_path or db.DB_PATH)
+        self.taille_lot = taille_lot
+        self.delai_lot = delai_lot
+        self.synchronous = synchronous.upper()
+        self._file = queue.Queue(maxsize=taille_file)
+        self._arrete = False
+        self._erreur_fatale = None
+        self._compteurs = {"modifications": 0, "erreurs": 0, "transactions": 0}
+        self._verrou = threading.Lock()
+        #Protège _arrete et les dépôts dans la file (jamais tenu pendant une attente)
+        self._verrou_file = threading.Lock()
+        self._pret = threading.Event()
+        self._erreur_demarrage = None
+        self._thread = threading.Thread(target=self._boucle, name="tomatocycle-ecrivain", daemon=True)
+        self._thread.start()
+        self._pret.wait()
+        if self._erreur_demarrage is not None:
+            raise self._erreur_demarrage
+
+    #Ouverture de l'unique connexion en écriture
+    def _ouvrir(self):
+        connexion = sqlite3.connect(str(self.db_path), isolation_level=None, timeout=30.0)
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connexion
+
+    #-----------------------------------------
+    # Soumission
+    #-----------------------------------------
+
+    def soumettre(self, sql, params=(), bloquant=True, timeout=None):
+        """
+        Ajoute une requête (INSERT / UPDATE / DELETE) à la file.
+        Retourne un Future dont le résultat est le nombre de lignes modifiées.
+        Si la file est pleine : attend (bloquant=True, au plus `timeout` secondes)
+        ou lève FilePleine.
+        """
+        return self._ajouter(lambda connexion: connexion.execute(sql, params).rowcount, bloquant, timeout)
+
+    def soumettre_plusieurs(self, sql, liste_params, bloquant=True, timeout=None):
+        """Même chose avec executemany (une seule entrée dans la file)."""
+        liste_params = list(liste_params)
+        return self._ajouter(
+            lambda connexion: connexion.executemany(sql, liste_params).rowcount, bloquant, timeout
+        )
+
+    def soumettre_fonction(self, fonction, bloquant=True, timeout=None):
+        """
+        Ajoute une modification plus complexe : `fonction(connexion)` est appelée
+        dans la transaction du lot ; sa valeur de retour devient le résultat du Future.
+        """
+        return self._ajouter(fonction, bloquant, timeout)
+
+    def executer(self, sql, params=(), timeout=None):
+        """Soumet une requête et attend qu'elle soit commitée."""
+        return self.soumettre(sql, params, timeout=timeout).result(timeout)
+
+    def _ajouter(self, fonction, bloquant, timeout):
+        futur = Future()
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            #Vérification et dépôt sous le même verrou que l'arrêt : aucune
+            #modification ne peut entrer dans la file une fois le coordinateur arrêté
+            with self._verrou_file:
+                if self._arrete:
+                    raise self._exception_arret()
+                try:
+                    self._file.put_nowait((fonction, futur))
+                    return futur
+                except queue.Full:
+                    pass
+            restant = None if limite is None else limite - time.monotonic()
+            if not bloquant or (restant is not None and restant <= 0):
+                raise FilePleine(f"file d'écriture pleine ({self._file.maxsize} modifications en attente)")
+            #Attente d'une place libre (réveil à chaque retrait, au plus 50 ms)
+            with self._file.not_full:
+                self._file.not_full.wait(0.05 if restant is None else min(restant, 0.05))
+
+    def _exception_arret(self):
+        if self._erreur_fatale is not None:
+            return CoordinateurArrete(f"le thread écrivain s'est arrêté sur une erreur : {self._erreur_fatale!r}")
+        return CoordinateurArrete("le coordinateur d'écriture est arrêté")
+
+    #-----------------------------------------
+    # Thread écrivain
+    #-----------------------------------------
+
+    def _boucle(self):
+        try:
+            connexion = self._ouvrir()
+        except Exception as e:
+            self._erreur_demarrage = e
+            self._pret.set()
+            return
+        self._pret.set()
+
+        lot = []
+        try:
+            while True:
+                premier = self._file.get()
+                if premier is _ARRET:
+                    break
+                lot = [premier]
+                arret_demande = self._completer_lot(lot)
+                self._executer_lot(connexion, lot)
+                lot = []
+                if arret_demande:
+                    break
+        except BaseException as e:
+            self._erreur_fatale = e
+        finally:
+            #Plus aucun dépôt possible, puis échec de tout ce qui reste en attente
+            with self._verrou_file:
+                self._arrete = True
+            erreur = self._exception_arret()
+            for _, futur in lot:
+                self._echouer(futur, erreur)
+            while True:
+                try:
+                    element = self._file.get_nowait()
+                except queue.Empty:
+                    break
+                if element is not _ARRET:
+                    self._echouer(element[1], erreur)
+            connexion.close()
+
+    #On récupère les modifications déjà en attente (sans dépasser taille_lot) ;
+    #file vide : on commite tout de suite, sauf si delai_lot laisse le temps d'en attendre d'autres
+    def _completer_lot(self, lot):
+        limite = time.monotonic() + self.delai_lot
+        while len(lot) < self.taille_lot:
+            try:
+                element = self._file.get_nowait()
+            except queue.Empty:
+                attente = limite - time.monotonic()
+                if attente <= 0:
+                    return False
+                try:
+                    element = self._file.get(timeout=attente)
+                except queue.Empty:
+                    return False
+            if element is _ARRET:
+                return True
+            lot.append(element)
+        return False
+
+    #Échec d'un Future pas encore résolu (ignoré s'il a été annulé)
+    @staticmethod
+    def _echouer(futur, erreur):
+        if futur.done():
+            return
+        if not futur.running() and not futur.set_running_or_notify_cancel():
+            return
+        futur.set_exception(erreur)
+
+    def _executer_lot(self, connexion, lot):
+        resultats = []
+        try:
+            connexion.execute("BEGIN IMMEDIATE")
+            for fonction, futur in lot:
+                if not futur.set_running_or_notify_cancel():
+                    continue
+                connexion.execute("SAVEPOINT modification")
+                try:
+                    resultats.append((futur, fonction(connexion), None))
+                    connexion.execute("RELEASE modification")
+                except Exception as e:
+                    connexion.execute("ROLLBACK TO modification")
+                    connexion.execute("RELEASE modification")
+                    resultats.append((futur, None, e))
+            connexion.execute("COMMIT")
+        except Exception as e:
+            #Échec du lot entier (disque plein, base verrouillée...) : tout est annulé
+            if connexion.in_transaction:
+                connexion.execute("ROLLBACK")
+            for fonction, futur in lot:
+                self._echouer(futur, e)
+            with self._verrou:
+                self._compteurs["erreurs"] += len(lot)
+            return
+
+        #Les Futures ne sont résolus qu'après le commit
+        nb_erreurs = 0
+        for futur, resultat, erreur in resultats:
+            if erreur is None:
+                futur.set_result(resultat)
+            else:
+                nb_erreurs += 1
+                futur.set_exception(erreur)
+        with self._verrou:
+            self._compteurs["transactions"] += 1
+            self._compteurs["modifications"] += len(resultats) - nb_erreurs
+            self._compteurs["erreurs"] += nb_erreurs
+
+    #-----------------------------------------
+    # Arrêt et métriques
+    #-----------------------------------------
+
+    def fermer(self, timeout=None):
+        """Traite les modifications déjà en file puis arrête le thread écrivain."""
+        with self._verrou_file:
+            deja_arrete = self._arrete
+            self._arrete = True
+        if not deja_arrete:
+            #Hors du verrou : le thread écrivain libère de la place (ou vide la file s'il s'arrête)
+            self._file.put(_ARRET)
+        self._thread.join(timeout)
+
+    def metriques(self):
+        with self._verrou:
+            compteurs = dict(self._compteurs)
+        compteurs["en_attente"] = self._file.qsize()
+        compteurs["erreur_fatale"] = repr(self._erreur_fatale) if self._erreur_fatale else None
+        compteurs["taille_moyenne_lot"] = (
+            compteurs["modifications"] / compteurs["transactions"] if compteurs["transactions"] else 0.0
+        )
+        return compteurs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+#Un seul coordinateur par base dans le processus
+_COORDINATEURS = {}
+_COORDINATEURS_VERROU = threading.Lock()
+
+
+def obtenir_coordinateur(db_path=None, **options):
+    """Retourne le coordinateur partagé pour la base (créé au premier appel)."""
+    chemin = Path(db_path or db.DB_PATH).resolve()
+    with _COORDINATEURS_VERROU:
+        coordinateur = _COORDINATEURS.get(chemin)
+        if coordinateur is None or coordinateur._arrete:
+            coordinateur = CoordinateurEcriture(chemin, **options)
+            _COORDINATEURS[chemin] = coordinateur
+        return coordinateur
+
+
+#-----------------------------------------
+# FONCTIONS
+#-----------------------------------------
+
+def mettre_a_jour_date_semence(id_variete, annee, db_path=None, timeout=None):
+    """
+    Enregistre une nouvelle année de semence (Future résolu après commit).
+    Si la file est pleine, attend au plus `timeout` secondes puis lève FilePleine.
+    """
+    return obtenir_coordinateur(db_path).soumettre(
+        "UPDATE variete SET date_semence = ? WHERE id = ?", (str(int(annee)), int(id_variete)), timeout=timeout
+    )
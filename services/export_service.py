@@ -0,0 +1,318 @@
+"""
+Service Export
+Export des données en CSV, XLSX et Parquet, par blocs.
+
+Les données (table 'variete', sélection de campagne, statistiques) sont lues
+par blocs via un curseur SQLite (fetchmany) puis écrites bloc par bloc :
+la mémoire utilisée ne dépend pas de la taille de la table.
+
+- Une "source" est un générateur de blocs : (colonnes, lignes). Une source vide
+  produit un bloc sans lignes : l'en-tête (ou le schéma) est toujours écrit.
+- Un "writer" consomme ces blocs et écrit dans un fichier (chemin ou flux binaire)
+- Les types Parquet viennent des types déclarés dans SQLite (`types_variete`) ;
+  une colonne sans type déclaré est écrite en texte.
+
+openpyxl (XLSX) et pyarrow (Parquet) ne sont importés que si le format est demandé.
+"""
+
+#Importation des bibliothèques
+import csv
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from services import db
+from services import stats_service as stats
+
+
+#Nombre de lignes lues / écrites à la fois
+TAILLE_BLOC = 1000
+
+#Formats disponibles : extension -> type MIME
+FORMATS_EXPORT = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+#Colonnes exportées pour une sélection de campagne
+COLONNES_SELECTION = [
+    "id", "id_source", "nom", "date_semence",
+    "couleur", "forme", "taille", "precocite",
+]
+
+#Types des colonnes produites par source_stats
+TYPES_STATS = {"colonne": "TEXT", "valeur": "TEXT", "nombre": "INTEGER"}
+
+#Dossier des fichiers préparés pour les téléchargements (pages Streamlit)
+DOSSIER_TELECHARGEMENTS = db.ROOT / "exports" / ".telechargements"
+
+#Âge (en secondes) au-delà duquel un fichier préparé non réutilisé est supprimé
+AGE_MAX_TELECHARGEMENT = 24 * 3600
+
+
+#-----------------------------------------
+# SOURCES (générateurs de blocs)
+#-----------------------------------------
+
+#Lecture d'une requête SQL par blocs
+def blocs_requete(connexion, sql, params=(), taille_bloc=TAILLE_BLOC):
+    curseur = connexion.execute(sql, params)
+    colonnes = [c[0] for c in curseur.description]
+    vide = True
+    while True:
+        lignes = curseur.fetchmany(taille_bloc)
+        if not lignes:
+            break
+        vide = False
+        yield colonnes, [tuple(ligne) for ligne in lignes]
+    if vide:
+        yield colonnes, []
+
+
+#Découpage d'une liste de dictionnaires en blocs
+def blocs_liste(elements, colonnes, taille_bloc=TAILLE_BLOC):
+    if not elements:
+        yield colonnes, []
+    for debut in range(0, len(elements), taille_bloc):
+        yield colonnes, [
+            tuple(e.get(c) for c in colonnes) for e in elements[debut:debut + taille_bloc]
+        ]
+
+
+#Types SQLite acceptés dans une colonne numérique (typeof)
+_TYPEOF_NUMERIQUES = {"INTEGER": ("integer", "null"), "REAL": ("integer", "real", "null")}
+
+
+#Types déjà calculés par base : {chemin: (version du contenu, types)}
+_TYPES_VARIETE = {}
+_TYPES_VARIETE_VERROU = threading.Lock()
+
+
+def types_variete(db_path=None):
+    """
+    Types déclarés des colonnes de la table 'variete' : {colonne: "INTEGER", ...}.
+    SQLite accepte du texte dans une colonne numérique : une telle colonne est
+    alors annoncée en "TEXT" pour que l'export ne casse pas sur cette valeur.
+    Le résultat est gardé tant que le contenu de la base ne change pas.
+    """
+    chemin = Path(db_path or db.DB_PATH).resolve()
+    version = db.version_contenu(chemin)
+    with _TYPES_VARIETE_VERROU:
+        en_cache = _TYPES_VARIETE.get(chemin)
+    if en_cache is not None and en_cache[0] == version:
+        return dict(en_cache[1])
+    types = _lire_types_variete(chemin)
+    with _TYPES_VARIETE_VERROU:
+        _TYPES_VARIETE[chemin] = (version, types)
+    return dict(types)
+
+
+#Parcours de la table : une requête typeof() par colonne numérique
+def _lire_types_variete(db_path):
+    with db.obtenir_pool(db_path).connexion() as connexion:
+        types = {ligne["name"]: ligne["type"] for ligne in connexion.execute("PRAGMA table_info(variete)")}
+        for nom, type_declare in types.items():
+            acceptes = _TYPEOF_NUMERIQUES.get(_affinite(type_declare))
+            if acceptes is None:
+                continue
+            autre = connexion.execute(
+                f"SELECT 1 FROM variete WHERE typeof({nom}) NOT IN ({','.join('?' * len(acceptes))}) LIMIT 1",
+                acceptes,
+            ).fetchone()
+            if autre is not None:
+                types[nom] = "TEXT"
+    return types
+
+
+def source_catalogue(db_path=None, taille_bloc=TAILLE_BLOC):
+    """Table 'variete' complète, lue par blocs."""
+    with db.obtenir_pool(db_path).connexion() as connexion:
+        yield from blocs_requete(connexion, "SELECT * FROM variete ORDER BY id", taille_bloc=taille_bloc)
+
+
+def source_selection(selection, colonnes=COLONNES_SELECTION, taille_bloc=TAILLE_BLOC):
+    """Sélection de campagne (liste de variétés)."""
+    yield from blocs_liste(selection, colonnes, taille_bloc)
+
+
+def source_stats(db_path=None, colonnes=stats.COLONNES_STATS, taille_bloc=TAILLE_BLOC):
+    """Comptages par valeur pour chaque colonne : (colonne, valeur, nombre)."""
+    with db.obtenir_pool(db_path).connexion() as connexion:
+        for nom_colonne in colonnes:
+            if nom_colonne not in stats.COLONNES_STATS:
+                raise ValueError(f"colonne non autorisée : {nom_colonne}")
+            yield from blocs_requete(
+                connexion,
+                f"SELECT ? AS colonne, {nom_colonne} AS valeur, COUNT(*) AS nombre "
+                f"FROM variete GROUP BY {nom_colonne} ORDER BY nombre DESC, valeur",
+                (nom_colonne,),
+                taille_bloc=taille_bloc,
+            )
+
+
+#-----------------------------------------
+# WRITERS
+#-----------------------------------------
+
+#Ouverture d'une sortie binaire (chemin ou flux déjà ouvert)
+@contextmanager
+def _sortie_binaire(sortie):
+    if hasattr(sortie, "write"):
+        yield sortie
+    else:
+        Path(sortie).parent.mkdir(parents=True, exist_ok=True)
+        with open(sortie, "wb") as f:
+            yield f
+
+
+def ecrire_csv(blocs, sortie):
+    """Écrit les blocs en CSV (UTF-8, en-tête sur la première ligne)."""
+    with _sortie_binaire(sortie) as binaire:
+        texte = io.TextIOWrapper(binaire, encoding="utf-8", newline="")
+        writer = csv.writer(texte)
+        entete_ecrit = False
+        for colonnes, lignes in blocs:
+            if not entete_ecrit:
+                writer.writerow(colonnes)
+                entete_ecrit = True
+            writer.writerows(lignes)
+        texte.flush()
+        #On rend le flux binaire à l'appelant sans le fermer
+        texte.detach()
+
+
+def ecrire_xlsx(blocs, sortie, nom_feuille="donnees"):
+    """Écrit les blocs dans un classeur Excel (mode write_only d'openpyxl)."""
+    from openpyxl import Workbook
+
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(nom_feuille)
+    entete_ecrit = False
+    for colonnes, lignes in blocs:
+        if not entete_ecrit:
+            feuille.append(colonnes)
+            entete_ecrit = True
+        for ligne in lignes:
+            feuille.append(ligne)
+    with _sortie_binaire(sortie) as binaire:
+        classeur.save(binaire)
+
+
+#Affinité d'un type déclaré (règles simplifiées de SQLite)
+def _affinite(type_declare):
+    type_declare = (type_declare or "").upper()
+    if "INT" in type_declare:
+        return "INTEGER"
+    if any(t in type_declare for t in ("REAL", "FLOA", "DOUB")):
+        return "REAL"
+    return "TEXT"
+
+
+#Schéma Arrow : type déclaré de chaque colonne, texte si inconnu
+def _schema_parquet(colonnes, types=None):
+    import pyarrow as pa
+
+    types_arrow = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    types = types or {}
+    return pa.schema([pa.field(nom, types_arrow[_affinite(types.get(nom))]) for nom in colonnes])
+
+
+def ecrire_parquet(blocs, sortie, types=None):
+    """
+    Écrit les blocs en Parquet : un row group par bloc.
+    `types` ({colonne: type SQLite déclaré}) fixe le schéma avant la lecture
+    des données ; les colonnes sans type connu sont écrites en texte.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with _sortie_binaire(sortie) as binaire:
+        writer = None
+        try:
+            for colonnes, lignes in blocs:
+                if writer is None:
+                    schema = _schema_parquet(colonnes, types)
+                    en_texte = [pa.types.is_string(champ.type) for champ in schema]
+                    writer = pq.ParquetWriter(binaire, schema)
+                donnees = {}
+                for i, nom in enumerate(colonnes):
+                    valeurs = [ligne[i] for ligne in lignes]
+                    if en_texte[i]:
+                        valeurs = [None if v is None else str(v) for v in valeurs]
+                    donnees[nom] = valeurs
+                writer.write_table(pa.Table.from_pydict(donnees, schema=schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+WRITERS = {
+    "csv": ecrire_csv,
+    "xlsx": ecrire_xlsx,
+    "parquet": ecrire_parquet,
+}
+
+
+#-----------------------------------------
+# FONCTIONS
+#-----------------------------------------
+
+def exporter(blocs, format_export, sortie, types=None):
+    """
+    Écrit une source de blocs dans le format demandé (chemin ou flux binaire).
+    `types` ({colonne: type SQLite déclaré}) n'est utilisé que pour Parquet.
+    """
+    if format_export not in WRITERS:
+        raise ValueError(f"format d'export inconnu : {format_export}")
+    if format_export == "parquet":
+        ecrire_parquet(blocs, sortie, types)
+    else:
+        WRITERS[format_export](blocs, sortie)
+    return sortie
+
+
+def chemin_fichier(prefixe, version, format_export, dossier=DOSSIER_TELECHARGEMENTS):
+    """Chemin du fichier préparé pour ce contenu (qu'il existe déjà ou non)."""
+    return Path(dossier) / f"{prefixe}_{version}.{format_export}"
+
+
+def preparer_fichier(
+    prefixe, version, format_export, produire_blocs, dossier=DOSSIER_TELECHARGEMENTS, types=None
+):
+    """
+    Prépare un fichier d'export sur disque et retourne son chemin.
+    `version` doit identifier le contenu (version de la base, paramètres...) :
+    si le fichier existe déjà, il est réutilisé sans relire les données.
+    Les fichiers du même préfixe qui n'ont pas servi depuis AGE_MAX_TELECHARGEMENT
+    sont supprimés (ceux d'autres paramètres encore utilisés sont conservés).
+    """
+    chemin = chemin_fichier(prefixe, version, format_export, dossier)
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    if chemin.exists():
+        try:
+            #La date de modification indique la dernière utilisation
+            os.utime(chemin)
+            return chemin
+        except FileNotFoundError:
+            pass
+
+    #Écriture dans un fichier temporaire puis renommage (pas de fichier à moitié écrit)
+    temporaire = chemin.with_name(f"{chemin.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        exporter(produire_blocs(), format_export, temporaire, types)
+        os.replace(temporaire, chemin)
+    finally:
+        temporaire.unlink(missing_ok=True)
+
+    limite = time.time() - AGE_MAX_TELECHARGEMENT
+    for ancien in chemin.parent.glob(f"{prefixe}_*.{format_export}"):
+        try:
+            if ancien != chemin and ancien.stat().st_mtime < limite:
+                ancien.unlink()
+        except FileNotFoundError:
+            pass
+    return chemin
@@ -10,12 +10,12 @@ from reportlab.lib.pagesizes import A4
 from pathlib import Path
 
 
-def exporter_selection_pdf(selection, annee_campagne):
+def exporter_selection_pdf(selection, annee_campagne, export_dir="exports", nom_fichier=None):
     """Génère un PDF contenant la liste des variétés sélectionnées."""
-    export_dir = Path("exports")
-    export_dir.mkdir(exist_ok=True)
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
 
-    pdf_path = export_dir / f"campagne_{annee_campagne}.pdf"
+    pdf_path = export_dir / (nom_fichier or f"campagne_{annee_campagne}.pdf")
 
     doc = SimpleDocTemplate(str(pdf_path), pagesize=A4)
     styles = getSampleStyleSheet()
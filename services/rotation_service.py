@@ -0,0 +1,208 @@
+"""
+Service Rotation
+Moteur de sélection des variétés pour une campagne annuelle.
+
+Ce module ne dépend ni de Streamlit ni de pandas : il peut être importé
+par la page Campagne, par un script en ligne de commande ou par une tâche
+planifiée.
+
+La sélection repose sur deux principes :
+- Une priorité temporelle : les variétés avec les semences les plus anciennes
+   sont sélectionnées en premier afin d’éviter leur perte.
+- Une recherche de diversité : lorsque plusieurs variétés ont la même priorité
+   (même année de semence), un arbre de décision est utilisé pour équilibrer
+   les caractéristiques (couleur, forme, taille, précocité).
+"""
+
+#Importation des bibliothèques
+from collections import defaultdict, Counter
+from itertools import groupby
+
+
+#Valeurs par défaut d'une campagne
+OBJECTIF_DEFAUT = 40
+ANNEE_CAMPAGNE_DEFAUT = 2026
+DUREE_VIE_DEFAUT = 6
+
+#Identifiant de l'algorithme de sélection (à changer si la logique change :
+#les sélections mises en cache avec l'ancien identifiant ne sont plus utilisées)
+ALGORITHME = "arbre-diversite-v2-doublons"
+
+
+#-----------------------------------------
+# ARBRE DES CARACTERISTIQUES
+#-----------------------------------------
+
+# Construction d'un arbre de catégories
+def construire_arbre(varietes):
+    """
+    arbre à 4 niveaux à partir des variétés.
+    couleur
+        └── forme
+              └── taille
+                    └── précocité
+                          └── [liste de variétés]
+    """
+
+    #On crée les niveaux
+    #La fonction lambda avec defautdict permet de créer un sous dictionnaire automatiquement si il n'existe pas
+    arbre = defaultdict(
+        lambda: defaultdict(
+            lambda: defaultdict(
+                lambda: defaultdict(list)
+            )
+        )
+    )
+
+    # On parcourt toutes les variétés
+    for v in varietes:
+        couleur = v["couleur"]
+        forme = v["forme"]
+        taille = v["taille"]
+        precocite = v["precocite"]
+
+        # On place la variété dans la bonne "branche" de l'arbre
+        arbre[couleur][forme][taille][precocite].append(v)
+
+    return arbre
+
+#Fonction qui parcourt les feuilles de l'arbre
+def parcourir_feuilles(arbre):
+    for couleur, niveau_forme in arbre.items():
+        for forme, niveau_taille in niveau_forme.items():
+            for taille, niveau_precocite in niveau_taille.items():
+                for precocite, liste_varietes in niveau_precocite.items():
+                    yield couleur, forme, taille, precocite, liste_varietes
+
+
+# ----------------------------------------------------------
+# COMPTEURS DE DIVERSITE
+# ----------------------------------------------------------
+
+#On compte la diversité des caractéristiques
+def initialiser_compteurs():
+    return {
+        "couleur": Counter(),
+        "forme": Counter(),
+        "taille": Counter(),
+        "precocite": Counter(),
+    }
+
+#Mise à jour des compteurs
+def mettre_a_jour_compteurs(compteurs, variete):
+    compteurs["couleur"][variete["couleur"]] += 1
+    compteurs["forme"][variete["forme"]] += 1
+    compteurs["taille"][variete["taille"]] += 1
+    compteurs["precocite"][variete["precocite"]] += 1
+
+#Calcul d'un score de présence
+def score_feuille(compteurs, couleur, forme, taille, precocite):
+    """
+    Score d'une feuille = "à quel point ces caractéristiques sont déjà présentes".
+    Plus le score est petit, plus la feuille est intéressante pour équilibrer.
+    """
+    return (
+        compteurs["couleur"][couleur]
+        + compteurs["forme"][forme]
+        + compteurs["taille"][taille]
+        + compteurs["precocite"][precocite]
+    )
+
+
+# ----------------------------------------------------------
+# SELECTION
+# ----------------------------------------------------------
+
+#Sélection des variétés
+def selectionner_dans_annee(varietes_annee, nb_a_prendre, compteurs):
+    selection = []
+    arbre = construire_arbre(varietes_annee)
+
+    while len(selection) < nb_a_prendre:
+        meilleure_feuille = None
+        meilleur_score = None
+
+        #On cherche la feuille non vide avec le plus petit score
+        for couleur, forme, taille, precocite, liste_varietes in parcourir_feuilles(arbre):
+            if not liste_varietes:
+                continue
+
+            s = score_feuille(compteurs, couleur, forme, taille, precocite)
+            if meilleur_score is None or s < meilleur_score:
+                meilleur_score = s
+                meilleure_feuille = liste_varietes
+
+        #Sécurité (ne devrait pas arriver)
+        if meilleure_feuille is None:
+            break
+
+        #On prend une variété dans la meilleure feuille
+        variete = meilleure_feuille.pop()
+        selection.append(variete)
+        mettre_a_jour_compteurs(compteurs, variete)
+
+    return selection
+
+
+def selectionner_varietes(
+    varietes,
+    objectif=OBJECTIF_DEFAUT,
+    annee_campagne=ANNEE_CAMPAGNE_DEFAUT,
+    duree_vie=DUREE_VIE_DEFAUT,
+    groupes_doublons=None,
+):
+    """
+    Remplit une sélection à partir d'une liste de variétés (dictionnaires).
+    `groupes_doublons` ({id_source: id_cluster}, table 'doublon_variete') permet
+    de ne garder qu'une variété par groupe de quasi-doublons : la plus urgente.
+    Retourne (selection, nb_trop_vieux).
+    """
+    # date_semence est du TEXT -> on convertit en int
+    candidates = []
+    for v in varietes:
+        variete = dict(v)
+        variete["annee_semence"] = int(variete["date_semence"])
+        variete["age_semence"] = annee_campagne - variete["annee_semence"]
+        candidates.append(variete)
+
+    # On trie par année (plus ancien d'abord)
+    candidates.sort(key=lambda v: (v["annee_semence"], v["nom"]))
+
+    # Quasi-doublons : une seule place par groupe (la première rencontrée est la plus ancienne)
+    if groupes_doublons:
+        groupes_vus = set()
+        uniques = []
+        for variete in candidates:
+            groupe = groupes_doublons.get(variete.get("id_source"))
+            if groupe is not None:
+                if groupe in groupes_vus:
+                    continue
+                groupes_vus.add(groupe)
+            uniques.append(variete)
+    else:
+        uniques = candidates
+
+    selection = []
+    compteurs = initialiser_compteurs()
+
+    # On parcourt les années de la plus ancienne à la plus récente
+    for annee, groupe in groupby(uniques, key=lambda v: v["annee_semence"]):
+        if len(selection) >= objectif:
+            break
+
+        varietes_annee = list(groupe)
+        places_restantes = objectif - len(selection)
+
+        # Si on peut tout prendre, on prend tout (priorité temporelle)
+        if len(varietes_annee) <= places_restantes:
+            for variete in varietes_annee:
+                selection.append(variete)
+                mettre_a_jour_compteurs(compteurs, variete)
+        else:
+            # Sinon, on choisit une partie avec l'arbre (diversité globale)
+            selection_partielle = selectionner_dans_annee(varietes_annee, places_restantes, compteurs)
+            selection.extend(selection_partielle)
+
+    # Info "urgente" : semences dont l'âge dépasse la durée de vie
+    nb_trop_vieux = sum(1 for v in candidates if v["age_semence"] > duree_vie)
+    return selection, nb_trop_vieux
@@ -0,0 +1,342 @@
+"""
+Service Similarité
+Recherche de variétés "similaires" (substituts) : même profil de
+caractéristiques (couleur, forme, taille, précocité) et textes proches
+(descriptif, notes gustatives).
+
+- Chaque variété est représentée par un vecteur creux (scipy.sparse) :
+    * un encodage one-hot des caractéristiques
+    * un TF-IDF des mots du descriptif et des notes gustatives
+  Les deux blocs sont normalisés puis pondérés : le produit scalaire de deux
+  vecteurs est une moyenne pondérée des deux similarités cosinus.
+- Un index des k plus proches voisins est précalculé pour tout le catalogue
+  (calcul par blocs de lignes) et reconstruit dès que le contenu de la base
+  change. Une recherche n'est ensuite qu'une lecture de tableau.
+- L'index peut être conservé sur disque (.npz) dans TOMATOCYCLE_CACHE_DIR ;
+  seuls les NB_INDEX_DISQUE fichiers les plus récemment utilisés sont gardés.
+"""
+
+#Importation des bibliothèques
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from services import db
+
+
+#Caractéristiques encodées en one-hot
+COLONNES_CARACTERISTIQUES = ("couleur", "forme", "taille", "precocite")
+
+#Colonnes de texte utilisées pour le TF-IDF
+COLONNES_TEXTE = ("descriptif", "notes_gustatives")
+
+#Poids des deux blocs dans la similarité finale
+POIDS_CARACTERISTIQUES = 0.6
+POIDS_TEXTE = 0.4
+
+#Nombre de voisins gardés dans l'index
+NB_VOISINS = 20
+
+#Nombre d'index gardés sur disque (un par version du catalogue)
+NB_INDEX_DISQUE = 4
+
+#Nombre de lignes traitées à la fois lors du calcul de l'index
+TAILLE_BLOC = 512
+
+#Mots vides (français / anglais) ignorés dans les textes
+MOTS_VIDES = {
+    "les", "des", "une", "est", "par", "pour", "dans", "sur", "avec", "qui", "que", "aux",
+    "son", "ses", "sa", "ce", "cette", "elle", "il", "tres", "plus", "peu", "bien", "pas",
+    "mais", "ou", "et", "de", "du", "la", "le", "en", "au", "un", "a", "se", "ne",
+    "the", "and", "with", "for", "from", "this", "that", "are", "was",
+}
+
+
+#-----------------------------------------
+# VECTEURS
+#-----------------------------------------
+
+#Découpage d'un texte en mots normalisés (sans accents, minuscules)
+def decouper_mots(texte):
+    if not texte:
+        return []
+    texte = unicodedata.normalize("NFKD", texte)
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    return [m for m in re.findall(r"[a-z]{3,}", texte) if m not in MOTS_VIDES]
+
+
+#Normalisation L2 des lignes d'une matrice creuse
+def normaliser_lignes(matrice):
+    normes = np.sqrt(np.asarray(matrice.multiply(matrice).sum(axis=1)).ravel())
+    normes[normes == 0] = 1.0
+    return sparse.diags(1.0 / normes) @ matrice
+
+
+def matrice_caracteristiques(varietes):
+    """Encodage one-hot des caractéristiques (une colonne par valeur rencontrée)."""
+    vocabulaire = {}
+    lignes, colonnes = [], []
+    for i, v in enumerate(varietes):
+        for nom_colonne in COLONNES_CARACTERISTIQUES:
+            valeur = v.get(nom_colonne)
+            if valeur is None:
+                continue
+            j = vocabulaire.setdefault((nom_colonne, valeur), len(vocabulaire))
+            lignes.append(i)
+            colonnes.append(j)
+    donnees = np.ones(len(lignes), dtype=np.float32)
+    return sparse.csr_matrix((donnees, (lignes, colonnes)), shape=(len(varietes), max(1, len(vocabulaire))))
+
+
+def matrice_tfidf(varietes, min_documents=2):
+    """TF-IDF (tf logarithmique, idf lissé) des textes de chaque variété."""
+    documents = [
+        Counter(mot for nom_colonne in COLONNES_TEXTE for mot in decouper_mots(v.get(nom_colonne)))
+        for v in varietes
+    ]
+    frequences = Counter(mot for doc in documents for mot in doc)
+    vocabulaire = {}
+    for mot, nb in frequences.items():
+        if nb >= min_documents:
+            vocabulaire[mot] = len(vocabulaire)
+
+    n = len(varietes)
+    idf = np.zeros(max(1, len(vocabulaire)), dtype=np.float32)
+    for mot, j in vocabulaire.items():
+        idf[j] = math.log((1 + n) / (1 + frequences[mot])) + 1
+
+    lignes, colonnes, donnees = [], [], []
+    for i, doc in enumerate(documents):
+        for mot, nb in doc.items():
+            j = vocabulaire.get(mot)
+            if j is not None:
+                lignes.append(i)
+                colonnes.append(j)
+                donnees.append((1 + math.log(nb)) * idf[j])
+    return sparse.csr_matrix(
+        (np.array(donnees, dtype=np.float32), (lignes, colonnes)), shape=(n, len(idf))
+    )
+
+
+def construire_vecteurs(varietes):
+    """Matrice creuse (n_varietes x n_attributs) dont les lignes sont de norme <= 1."""
+    caracteristiques = normaliser_lignes(matrice_caracteristiques(varietes))
+    texte = normaliser_lignes(matrice_tfidf(varietes))
+    return sparse.hstack([
+        math.sqrt(POIDS_CARACTERISTIQUES) * caracteristiques,
+        math.sqrt(POIDS_TEXTE) * texte,
+    ]).tocsr()
+
+
+#-----------------------------------------
+# INDEX DES VOISINS
+#-----------------------------------------
+
+class IndexSimilarite:
+    """
+    Index des k plus proches voisins :
+    - ids[i]        : id de la variété de la ligne i
+    - voisins[i, r] : ligne du r-ième voisin de la ligne i
+    - scores[i, r]  : similarité correspondante (entre 0 et 1)
+    """
+
+    def __init__(self, ids, voisins, scores, version=None):
+        self.ids = np.asarray(ids)
+        self.voisins = np.asarray(voisins)
+        self.scores = np.asarray(scores)
+        self.version = version
+        self._lignes = {int(id_variete): i for i, id_variete in enumerate(self.ids)}
+
+    @classmethod
+    def construire(cls, varietes, k=NB_VOISINS, version=None):
+        vecteurs = construire_vecteurs(varietes)
+        n = vecteurs.shape[0]
+        k = max(0, min(k, n - 1))
+        voisins = np.zeros((n, k), dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float32)
+        transposee = vecteurs.T.tocsc()
+
+        for debut in range(0, n, TAILLE_BLOC):
+            fin = min(n, debut + TAILLE_BLOC)
+            bloc = (vecteurs[debut:fin] @ transposee).toarray()
+            #Une variété n'est pas son propre voisin
+            bloc[np.arange(fin - debut), np.arange(debut, fin)] = -np.inf
+            if k == 0:
+                continue
+            meilleurs = np.argpartition(-bloc, k - 1, axis=1)[:, :k]
+            valeurs = np.take_along_axis(bloc, meilleurs, axis=1)
+            ordre = np.argsort(-valeurs, axis=1, kind="stable")
+            voisins[debut:fin] = np.take_along_axis(meilleurs, ordre, axis=1)
+            scores[debut:fin] = np.take_along_axis(valeurs, ordre, axis=1)
+
+        ids = np.array([v["id"] for v in varietes], dtype=np.int64)
+        return cls(ids, voisins, scores, version)
+
+    def __contains__(self, id_variete):
+        return int(id_variete) in self._lignes
+
+    def voisins_de(self, id_variete, k=None):
+        """Liste [(id_voisin, score), ...] triée du plus proche au moins proche."""
+        ligne = self._lignes.get(int(id_variete))
+        if ligne is None:
+            return []
+        #k ramené entre 0 et le nombre de voisins gardés (un k négatif ne doit pas découper à l'envers)
+        k = self.voisins.shape[1] if k is None else min(max(0, int(k)), self.voisins.shape[1])
+        return [
+            (int(self.ids[j]), float(s))
+            for j, s in zip(self.voisins[ligne, :k], self.scores[ligne, :k])
+        ]
+
+    def sauvegarder(self, chemin):
+        chemin = Path(chemin)
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        temporaire = chemin.with_name(f"{chemin.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temporaire, ids=self.ids, voisins=self.voisins, scores=self.scores)
+        os.replace(temporaire, chemin)
+
+    @classmethod
+    def charger(cls, chemin, version=None):
+        with np.load(chemin) as fichier:
+            return cls(fichier["ids"], fichier["voisins"], fichier["scores"], version)
+
+
+#Suppression des anciens index sur disque (les moins récemment utilisés)
+def nettoyer_index_disque(dossier, garder=NB_INDEX_DISQUE):
+    fichiers = []
+    for chemin in Path(dossier).glob("similarite_*.npz"):
+        try:
+            fichiers.append((chemin.stat().st_mtime_ns, chemin))
+        except FileNotFoundError:
+            continue
+    fichiers.sort(reverse=True)
+    for _, chemin in fichiers[garder:]:
+        try:
+            chemin.unlink()
+        except FileNotFoundError:
+            pass
+
+
+#Index en mémoire par base : {chemin: IndexSimilarite}
+_INDEX = {}
+_INDEX_VERROU = threading.Lock()
+
+
+def obtenir_index(db_path=None):
+    """
+    Retourne l'index de la base, reconstruit seulement si le contenu a changé
+    (ou relu depuis TOMATOCYCLE_CACHE_DIR s'il y a été sauvegardé).
+    """
+    chemin = Path(db_path or db.DB_PATH).resolve()
+    version = db.version_contenu(chemin)
+    with _INDEX_VERROU:
+        index = _INDEX.get(chemin)
+        if index is not None and index.version == version:
+            return index
+
+        dossier_cache = os.getenv("TOMATOCYCLE_CACHE_DIR")
+        fichier = Path(dossier_cache) / f"similarite_{version[:16]}_k{NB_VOISINS}.npz" if dossier_cache else None
+        if fichier is not None and fichier.exists():
+            index = IndexSimilarite.charger(fichier, version)
+            os.utime(fichier)
+        else:
+            varietes = db.obtenir_pool(chemin).requete("SELECT * FROM variete ORDER BY id")
+            index = IndexSimilarite.construire(varietes, version=version)
+            if fichier is not None:
+                index.sauvegarder(fichier)
+                nettoyer_index_disque(fichier.parent)
+        _INDEX[chemin] = index
+        return index
+
+
+#-----------------------------------------
+# FONCTIONS
+#-----------------------------------------
+
+def varietes_similaires(id_variete, k=10, db_path=None):
+    """Variétés les plus proches de `id_variete` : liste de dictionnaires avec 'score'."""
+    voisins = obtenir_index(db_path).voisins_de(id_variete, k)
+    if not voisins:
+        return []
+    ids = [id_voisin for id_voisin, _ in voisins]
+    lignes = db.obtenir_pool(db_path).requete(
+        f"SELECT * FROM variete WHERE id IN ({','.join('?' * len(ids))})", ids
+    )
+    par_id = {ligne["id"]: ligne for ligne in lignes}
+    return [
+        {**par_id[id_voisin], "score": round(score, 4)}
+        for id_voisin, score in voisins
+        if id_voisin in par_id
+    ]
+
+
+#Groupe de quasi-doublons de chaque variété : {id: id_cluster} (variétés groupées seulement)
+def groupes_doublons(db_path=None):
+    with db.obtenir_pool(db_path).connexion() as connexion:
+        doublons = db.charger_doublons(connexion)
+        if not doublons:
+            return {}
+        return {
+            id_variete: doublons[id_source]
+            for id_variete, id_source in connexion.execute("SELECT id, id_source FROM variete")
+            if id_source in doublons
+        }
+
+
+def substituer_indisponibles(selection, ids_indisponibles, db_path=None):
+    """
+    Remplace dans une sélection chaque variété indisponible (impossible à semer)
+    par sa voisine la plus proche qui n'est ni déjà sélectionnée ni indisponible,
+    ni le quasi-doublon (table 'doublon_variete') d'une de ces variétés.
+    Retourne (nouvelle_selection, remplacements) où remplacements est une liste
+    de (id_remplace, id_substitut) ; id_substitut vaut None si aucun voisin ne convient.
+    """
+    ids_indisponibles = {int(i) for i in ids_indisponibles}
+    if not ids_indisponibles:
+        return list(selection), []
+
+    index = obtenir_index(db_path)
+    groupes = groupes_doublons(db_path)
+    deja_pris = {v["id"] for v in selection} | ids_indisponibles
+    groupes_pris = {groupes[i] for i in deja_pris if i in groupes}
+
+    def disponible(id_voisin):
+        return id_voisin not in deja_pris and groupes.get(id_voisin) not in groupes_pris
+
+    substituts = {}
+    for variete in selection:
+        if variete["id"] not in ids_indisponibles:
+            continue
+        substitut = next(
+            (id_voisin for id_voisin, _ in index.voisins_de(variete["id"]) if disponible(id_voisin)),
+            None,
+        )
+        substituts[variete["id"]] = substitut
+        if substitut is not None:
+            deja_pris.add(substitut)
+            if substitut in groupes:
+                groupes_pris.add(groupes[substitut])
+
+    ids_substituts = [i for i in substituts.values() if i is not None]
+    par_id = {}
+    if ids_substituts:
+        lignes = db.obtenir_pool(db_path).requete(
+            f"SELECT * FROM variete WHERE id IN ({','.join('?' * len(ids_substituts))})", ids_substituts
+        )
+        par_id = {ligne["id"]: ligne for ligne in lignes}
+
+    nouvelle_selection = []
+    for variete in selection:
+        if variete["id"] in substituts:
+            substitut = substituts[variete["id"]]
+            if substitut in par_id:
+                nouvelle_selection.append({**par_id[substitut], "substitut_de": variete["id"]})
+        else:
+            nouvelle_selection.append(variete)
+    return nouvelle_selection, list(substituts.items())
@@ -17,3 +17,18 @@ from services import db
 def compter_par_colonne(df_variete, nom_colonne):
     return df_variete[nom_colonne].value_counts().reset_index()
 
+
+#Colonnes sur lesquelles on peut agréger
+COLONNES_STATS = ("couleur", "forme", "taille", "precocite", "notes_gustatives", "date_semence")
+
+
+#Même comptage, mais calculé directement en SQL (sans charger la table)
+def compter_par_colonne_sql(connexion, nom_colonne):
+    """Retourne [{valeur, nombre}, ...] trié du plus fréquent au moins fréquent."""
+    if nom_colonne not in COLONNES_STATS:
+        raise ValueError(f"colonne non autorisée : {nom_colonne}")
+    curseur = connexion.execute(
+        f"SELECT {nom_colonne} AS valeur, COUNT(*) AS nombre "
+        f"FROM variete GROUP BY {nom_colonne} ORDER BY nombre DESC, valeur"
+    )
+    return [{"valeur": valeur, "nombre": nombre} for valeur, nombre in curseur]